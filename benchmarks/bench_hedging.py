@@ -0,0 +1,65 @@
+""" Tail latency of GET lookups with and without hedged requests
+
+Usage: python benchmarks/bench_hedging.py [calls]
+
+The mock answers in 5 ms, except 3% of the requests which take 150 ms. Device object, ticket and rule doc lookups
+are timed over a plain session, then over a HedgedSession hedging at the 95th percentile with a 10% budget.
+"""
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+import requests
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient
+from security_manager_apis.hedging import HedgedSession
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(url: str, session, calls: int) -> list:
+    client = FireMonClient(url, 'user', 'pass', False, '1', workflow_name='Access Req WF', session=session)
+    sm, pp = client.security_manager, client.policy_planner
+    pp.workflow_id
+    lookups = (lambda i: sm.get_device_obj(str(i % 10 + 1)), lambda i: pp.pull_pp_ticket(str(i % 50 + 1)),
+               lambda i: sm.get_rule_doc(str(i % 10 + 1), 'rule-{0}'.format(i)))
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        lookups[i % 3](i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    mock = MockFireMon(latency=0.005, slow_fraction=0.03, slow_latency=0.15)
+    url = mock.start()
+    try:
+        for hedged in (False, True):
+            session = requests.Session()
+            if hedged:
+                session = HedgedSession(session, percentile=0.95, budget=0.1)
+            before = mock.requests
+            latencies = run(url, session, calls)
+            print('{0}: p50 {1:.1f} ms, p99 {2:.1f} ms, p99.9 {3:.1f} ms, {4} requests'.format(
+                'hedged' if hedged else 'plain ', percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.99) * 1000, percentile(latencies, 0.999) * 1000, mock.requests - before))
+            if hedged:
+                stats = session.stats()
+                print('  hedges fired {0}, won {1}, denied by budget {2}'.format(
+                    stats['hedges_fired'], stats['hedges_won'], stats['budget_denied']))
+            session.close()
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+""" Import-time and first-call-latency benchmark of the lazy FireMonClient facade
+
+Usage: python benchmarks/bench_import_latency.py [latency_seconds]
+
+"eager" reproduces loading every subsystem up front and logging in from each constructor (plus the workflow
+lookups), which is what the API classes did before their login became lazy.
+"""
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, '..', 'src')
+sys.path.insert(0, SRC)
+sys.path.insert(0, HERE)
+
+IMPORT_LAZY = 'import security_manager_apis; security_manager_apis.FireMonClient("h", "u", "p", False, "1")'
+IMPORT_EAGER = ('import security_manager_apis.security_manager, security_manager_apis.policy_planner, '
+                'security_manager_apis.policy_optimizer, security_manager_apis.orchestration_apis')
+
+
+def import_time(statement: str, runs: int = 5) -> float:
+    env = dict(os.environ, PYTHONPATH=SRC)
+    best = None
+    for _ in range(runs):
+        out = subprocess.check_output(
+            [sys.executable, '-c', 'import time; t = time.perf_counter(); {0}; print(time.perf_counter() - t)'.
+             format(statement)], env=env)
+        elapsed = float(out)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def first_call(url: str, eager: bool) -> float:
+    from security_manager_apis import FireMonClient
+    start = time.perf_counter()
+    client = FireMonClient(url, 'user', 'pass', False, '1', workflow_name='Access Req WF',
+                           po_workflow_name='Access Req WF')
+    if eager:
+        for name in ('security_manager', 'policy_planner', 'policy_optimizer', 'orchestration'):
+            subsystem = getattr(client, name)
+            subsystem.headers = dict(subsystem.api_instance.get_auth_token())
+            if hasattr(subsystem, 'workflow_name'):
+                subsystem.workflow_id
+    client.security_manager.get_devices()
+    return time.perf_counter() - start
+
+
+def main():
+    from mock_server import MockFireMon
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.02
+    print('import, lazy facade:    {0:.1f} ms'.format(import_time(IMPORT_LAZY) * 1000))
+    print('import, all subsystems: {0:.1f} ms'.format(import_time(IMPORT_EAGER) * 1000))
+    mock = MockFireMon(latency=latency)
+    url = mock.start()
+    try:
+        for eager in (True, False):
+            before = mock.requests
+            elapsed = first_call(url, eager)
+            print('first call, {0} {1:.1f} ms, {2} requests'.format(
+                'eager init: ' if eager else 'lazy facade:', elapsed * 1000, mock.requests - before))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+""" Client hot spots under a mixed workload, and the overhead of profiling it
+
+Usage: python benchmarks/bench_profiler.py [output_dir]
+
+Pages through SIQL rules, looks up device objects and bulk-adds supplemental routes from a file with 4 threads,
+once without the profiler, once sampling and once also tracing allocations (tracemalloc slows every allocation
+down, including those of the in-process mock server here), then prints the top API methods and endpoints and writes cpu.folded and
+alloc.folded (flamegraph.pl cpu.folded > cpu.svg, or open them in speedscope).
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient
+from security_manager_apis.profiler import Profiler
+
+ROUTES = 'device,interface,destination,gateway,vr,next_vr,metric,drop\n' + ''.join(
+    '1,eth1,10.{0}.{1}.0/24,192.168.1.1,,,10,false\n'.format(i // 250, i % 250) for i in range(100))
+
+
+def workload(sm):
+    def job(i):
+        if i % 3 == 0:
+            sm.siql_query('secrule', 'domain { id = 1 }', 1000, page=i % 5)
+        elif i % 3 == 1:
+            for device_id in range(1, 11):
+                sm.get_device_obj(str(device_id))
+        else:
+            sm.bulk_add_supp_route(io.StringIO(ROUTES))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(job, range(24)))
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else '.'
+    mock = MockFireMon(latency=0.001, rules=5000)
+    url = mock.start()
+    try:
+        sm = FireMonClient(url, 'user', 'pass', False, '1').security_manager
+        sm.headers
+        start = time.perf_counter()
+        workload(sm)
+        plain = time.perf_counter() - start
+
+        profiler = Profiler(interval=0.002, trace_allocations=False).instrument(sm)
+        start = time.perf_counter()
+        with profiler:
+            workload(sm)
+        sampled = time.perf_counter() - start
+
+        profiler.uninstrument()
+        allocs = Profiler(interval=0.002, trace_allocations=True, tracemalloc_frames=16).instrument(sm)
+        start = time.perf_counter()
+        with allocs:
+            workload(sm)
+        traced = time.perf_counter() - start
+        print('run: {0:.2f} s plain, {1:.2f} s sampled, {2:.2f} s sampled + tracemalloc'.format(plain, sampled, traced))
+
+        report = profiler.report()
+        alloc_report = allocs.report()
+        print('{0:<60} {1:>6} {2:>8} {3:>8} {4:>8} {5:>9}'.format('label', 'calls', 'wall s', 'cpu s', 'samples',
+                                                                   'alloc KB'))
+        for label, stats in sorted(report.items(), key=lambda item: -item[1]['cpu_seconds'])[:12]:
+            print('{0:<60} {1:>6} {2:>8.3f} {3:>8.3f} {4:>8} {5:>9.1f}'.format(
+                label, stats['calls'], stats['seconds'], stats['cpu_seconds'], stats['samples'],
+                alloc_report.get(label, {}).get('alloc_bytes', 0) / 1e3))
+        cpu = profiler.write_collapsed(os.path.join(out_dir, 'cpu.folded'), 'cpu')
+        alloc = allocs.write_collapsed(os.path.join(out_dir, 'alloc.folded'), 'alloc')
+        print('wrote {0} cpu stacks and {1} allocation stacks to {2}'.format(cpu, alloc, out_dir))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
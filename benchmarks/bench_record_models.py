@@ -0,0 +1,67 @@
+""" Memory benchmark of typed record models against the raw dict representation
+
+Usage: python benchmarks/bench_record_models.py [rule_count]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from security_manager_apis import record_models  # noqa: E402
+
+
+def make_rule(i: int) -> dict:
+    device = i % 40
+    return {
+        'matchId': '16959bc0-b9f7-436b-9851-{0:012d}'.format(i),
+        'ruleName': 'rule-{0}'.format(i),
+        'ruleNumber': i % 2000,
+        'action': 'ACCEPT' if i % 3 else 'DROP',
+        'disabled': False,
+        'device': {'id': device, 'name': 'fw-dc{0}-edge'.format(device), 'devicePack': {'vendor': 'Palo Alto Networks'}},
+        'policy': {'id': 'pol-{0}'.format(device), 'name': 'policy-{0}'.format(device)},
+        'srcContext': {'zones': [{'name': 'trust'}, {'name': 'dmz'}]},
+        'dstContext': {'zones': [{'name': 'untrust'}]},
+        'sources': [{'displayName': '10.{0}.{1}.0/24'.format(i % 250, device),
+                     'addresses': [{'address': '10.{0}.{1}.0'.format(i % 250, device), 'cidr': 24}]}],
+        'destinations': [{'displayName': 'any', 'addresses': []}],
+        'services': [{'displayName': 'tcp/443', 'services': [{'type': 'TCP', 'startPort': 443, 'endPort': 443}]}],
+        'apps': [{'displayName': 'ssl'}],
+        'users': [],
+        'ruleLastChanged': '2022-01-01T00:00:00+0000',
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    # One JSON page per 1000 rules, decoded separately as the client would receive them
+    pages = [json.dumps({'results': [make_rule(i) for i in range(p, min(p + 1000, count))]})
+             for p in range(0, count, 1000)]
+
+    dicts, dict_bytes = measure(lambda: [r for page in pages for r in json.loads(page)['results']])
+    del dicts
+    records, record_bytes = measure(
+        lambda: [r for page in pages for r in record_models.siql_from_json('secrule', json.loads(page))])
+
+    print('rules:            {0}'.format(count))
+    print('dict bytes:       {0:,} ({1:.0f} per rule)'.format(dict_bytes, dict_bytes / count))
+    print('record bytes:     {0:,} ({1:.0f} per rule)'.format(record_bytes, record_bytes / count))
+    print('reduction:        {0:.1f}x'.format(dict_bytes / record_bytes))
+    print('lazy field check: {0}'.format(records[0].extra()['sources'][0]['addresses'][0]['address']))
+
+
+if __name__ == '__main__':
+    main()
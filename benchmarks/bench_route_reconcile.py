@@ -0,0 +1,70 @@
+""" Nightly supplemental-route sync: full re-push with bulk_add_supp_route vs reconcile_supp_routes
+
+Usage: python benchmarks/bench_route_reconcile.py [devices] [routes_per_device]
+
+The mock starts with the routes already loaded, the nightly file changes 1% of them.
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient
+
+HEADER = 'device,interface,destination,gateway,virtual_router,next_virtual_router,metric,drop\n'
+
+
+def route_file(devices: int, per_device: int, changed: float = 0.0) -> io.StringIO:
+    lines = [HEADER]
+    for device_id in range(1, devices + 1):
+        for i in range(per_device):
+            metric = 20 if i < per_device * changed else 10
+            lines.append('{0},eth1,10.{1}.{2}.0/24,192.168.{0}.1,,,{3},false\n'.format(device_id, i // 250, i % 250,
+                                                                                          metric))
+    return io.StringIO(''.join(lines))
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    per_device = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    mock = MockFireMon(latency=0.002)
+    url = mock.start()
+    try:
+        sm = FireMonClient(url, 'user', 'pass', False, '1').security_manager
+        plan = sm.reconcile_supp_routes(route_file(devices, per_device), max_workers=16)
+        print('initial load: {0}'.format(plan.summary()))
+        nightly = route_file(devices, per_device, changed=0.01)
+
+        before = mock.requests
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sm.bulk_add_supp_route(io.StringIO(nightly.getvalue()))
+        stored = sum(len(routes) for routes in mock.supp_routes.values())
+        print('full re-push: {0:.1f} s, {1} requests, {2} routes stored afterwards'.format(
+            time.perf_counter() - start, mock.requests - before, stored))
+
+        sm.reconcile_supp_routes(route_file(devices, per_device), max_workers=16)
+        before = mock.requests
+        start = time.perf_counter()
+        plan = sm.reconcile_supp_routes(io.StringIO(nightly.getvalue()), dry_run=True, max_workers=16)
+        print('dry run:      {0:.2f} s, {1} requests, {2}'.format(time.perf_counter() - start,
+                                                                 mock.requests - before, plan.summary()))
+        before = mock.requests
+        start = time.perf_counter()
+        plan = sm.reconcile_supp_routes(io.StringIO(nightly.getvalue()), max_workers=16)
+        stored = sum(len(routes) for routes in mock.supp_routes.values())
+        print('reconcile:    {0:.2f} s, {1} requests, {2} routes stored afterwards, {3}'.format(
+            time.perf_counter() - start, mock.requests - before, stored, plan.summary()))
+        print('\n'.join(plan.lines()[:3]))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+""" Interactive latency and batch throughput with and without the priority scheduler
+
+Usage: python benchmarks/bench_scheduler.py [seconds]
+
+The mock server handles at most 8 requests at a time. Batch threads page through SIQL rule searches while one
+interactive thread looks up a device object every 50 ms, first over a plain shared session (every request queues
+at the server), then through a RequestScheduler with 12 slots (1.5x the server's workers, so it stays busy while
+responses are read) and batch capped at 10 of them.
+"""
+import os
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+import requests
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient, scheduler
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(url: str, batch_session, interactive_session, seconds: float, batch_threads: int = 32) -> tuple:
+    batch = FireMonClient(url, 'user', 'pass', False, '1', session=batch_session).security_manager
+    interactive = FireMonClient(url, 'user', 'pass', False, '1', session=interactive_session).security_manager
+    batch.headers
+    interactive.headers
+    stop = threading.Event()
+    pages = [0]
+    lock = threading.Lock()
+
+    def batch_worker():
+        page = 0
+        while not stop.is_set():
+            batch.siql_query('secrule', 'domain { id = 1 }', 100, page=page % 10)
+            page += 1
+            with lock:
+                pages[0] += 1
+
+    threads = [threading.Thread(target=batch_worker) for _ in range(batch_threads)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        interactive.get_device_obj('3')
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, pages[0] / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    mock = MockFireMon(latency=0.02, workers=8)
+    url = mock.start()
+    try:
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=64)
+        shared = requests.Session()
+        shared.mount('http://', adapter)
+        latencies, throughput = run(url, shared, shared, seconds)
+        print('shared session: interactive p50 {0:.0f} ms, p99 {1:.0f} ms, batch {2:.0f} req/s'.format(
+            percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, throughput))
+        sched = scheduler.RequestScheduler(max_concurrency=12, classes={
+            scheduler.INTERACTIVE: {'weight': 8, 'max_concurrency': None},
+            scheduler.BATCH: {'weight': 1, 'max_concurrency': 10}})
+        latencies, throughput = run(url, sched.session(shared, scheduler.BATCH),
+                                    sched.session(shared, scheduler.INTERACTIVE), seconds)
+        print('scheduler:      interactive p50 {0:.0f} ms, p99 {1:.0f} ms, batch {2:.0f} req/s'.format(
+            percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, throughput))
+        for name, stats in sorted(sched.stats().items()):
+            print('  {0:<11} completed {1:>5}, queue wait p50 {2:.1f} ms, p99 {3:.1f} ms'.format(
+                name, stats['completed'], stats['wait_p50'] * 1000, stats['wait_p99'] * 1000))
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
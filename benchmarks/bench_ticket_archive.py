@@ -0,0 +1,72 @@
+""" Ticket archive throughput, serial walk vs TicketArchive, and resuming after an interruption
+
+Usage: python benchmarks/bench_ticket_archive.py [tickets]
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient
+from security_manager_apis.ticket_archive import TicketArchive
+
+
+class Interrupted(Exception):
+    pass
+
+
+def main():
+    tickets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    mock = MockFireMon(latency=0.005, tickets=tickets)
+    url = mock.start()
+    out_dir = tempfile.mkdtemp()
+    try:
+        pp = FireMonClient(url, 'user', 'pass', False, '1', workflow_name='Access Req WF').policy_planner
+        pp.workflow_id
+        sample = 100
+        start = time.perf_counter()
+        for ticket_id in range(1, sample + 1):
+            pp.pull_pp_ticket(str(ticket_id))
+            pp.get_reqs(str(ticket_id))
+            pp.get_comments(str(ticket_id))
+            pp.retrieve_pca(str(ticket_id))
+        serial = sample / (time.perf_counter() - start)
+        print('serial walk:   {0:.0f} tickets/s, {1:.0f} s for {2} tickets'.format(serial, tickets / serial, tickets))
+
+        def stop_after_first_shard(progress):
+            if progress['archived'] >= 500:
+                raise Interrupted()
+
+        try:
+            TicketArchive(pp, out_dir, max_workers=32, shard_size=500).run(progress=stop_after_first_shard)
+        except Interrupted:
+            pass
+        archive = TicketArchive(pp, out_dir, max_workers=32, shard_size=500)
+        print('interrupted:   {0} tickets in the checkpoint'.format(len(archive.done)))
+        before = mock.requests
+        result = archive.run(progress=None)
+        print('resumed:       {0:.0f} tickets/s, {1} archived, {2}/{3} done, {4} requests'.format(
+            result['tickets_per_second'], result['archived'], result['done'], result['total'],
+            mock.requests - before))
+        lines = 0
+        size = 0
+        for name in archive.shards:
+            path = os.path.join(out_dir, name)
+            size += os.path.getsize(path)
+            with gzip.open(path, 'rt') as f:
+                lines += sum(1 for _ in f)
+        print('shards:        {0} files, {1} lines, {2:.1f} KB'.format(len(archive.shards), lines, size / 1e3))
+    finally:
+        mock.stop()
+        shutil.rmtree(out_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+""" Bytes on the wire and latency of the transports in security_manager_apis.transport
+
+Usage: python benchmarks/bench_transport.py [latency_seconds]
+
+- responses: paging a SIQL rule search with identity vs gzip response encoding
+- requests: posting a large requirements body plain vs gzip-compressed (CompressingSession)
+- concurrency: concurrent device lookups over requests.Session vs Http2Session. The mock speaks plain HTTP/1.1,
+  so Http2Session falls back to HTTP/1.1 here; multiplexing only happens against an HTTP/2 server over TLS.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+from mock_server import MockFireMon
+from security_manager_apis import FireMonClient
+from security_manager_apis.paging import fetch_all
+from security_manager_apis.transport import create_session
+
+
+def client(url: str, session) -> FireMonClient:
+    return FireMonClient(url, 'user', 'pass', False, '1', workflow_name='Access Req WF', session=session)
+
+
+def siql_pages(mock: MockFireMon, url: str, session) -> tuple:
+    sm = client(url, session).security_manager
+    sm.headers
+    before = mock.bytes_sent
+    start = time.perf_counter()
+    rows = fetch_all(lambda page: sm.siql_query('secrule', 'domain { id = 1 }', 1000, page=page), 1000)
+    return len(rows), mock.bytes_sent - before, time.perf_counter() - start
+
+
+def post_requirements(mock: MockFireMon, url: str, session, count: int = 200) -> tuple:
+    pp = client(url, session).policy_planner
+    req_json = [{'sources': ['10.{0}.{1}.0/24'.format(i // 250, i % 250)], 'destinations': ['192.168.1.10'],
+                 'services': ['tcp/443'], 'action': 'ACCEPT', 'requirementType': 'RULE',
+                 'variables': {'expiration': '2030-01-01T00:00:00+0000', 'comment': 'bulk requirement {0}'.format(i)}}
+                for i in range(count)]
+    pp.headers
+    pp.pull_pp_ticket('1')
+    before = mock.bytes_received
+    start = time.perf_counter()
+    for _ in range(10):
+        pp.add_req_pp_ticket('1', req_json)
+    return mock.bytes_received - before, time.perf_counter() - start
+
+
+def concurrent_lookups(url: str, session, calls: int = 400, workers: int = 16) -> float:
+    sm = client(url, session).security_manager
+    sm.headers
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(sm.get_device_obj, [str(i % 10 + 1) for i in range(calls)]))
+    return time.perf_counter() - start
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.005
+    for compress in (False, True):
+        mock = MockFireMon(latency=latency, rules=20000, compress=compress)
+        url = mock.start()
+        try:
+            rows, sent, elapsed = siql_pages(mock, url, create_session())
+            print('responses, {0}: {1} rules, {2:.2f} MB, {3:.0f} ms'.format(
+                'gzip    ' if compress else 'identity', rows, sent / 1e6, elapsed * 1000))
+        finally:
+            mock.stop()
+    mock = MockFireMon(latency=latency)
+    url = mock.start()
+    try:
+        for compress in (False, True):
+            received, elapsed = post_requirements(mock, url, create_session(compress_requests=compress))
+            print('requests,  {0}: {1:.1f} KB uploaded, {2:.0f} ms'.format(
+                'gzip    ' if compress else 'identity', received / 1e3, elapsed * 1000))
+        for http2 in (False, True):
+            session = create_session(http2=http2, verify_ssl=False, pool_maxsize=16)
+            elapsed = concurrent_lookups(url, session)
+            print('concurrency, {0}: {1:.0f} ms'.format('Http2Session   ' if http2 else 'requests.Session', elapsed * 1000))
+            session.close()
+    finally:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
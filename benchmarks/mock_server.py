@@ -0,0 +1,169 @@
+""" Minimal in-process FireMon mock used by the benchmarks
+
+Serves canned JSON for the endpoints in application.properties with an optional per-request latency.
+"""
+import gzip
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+def _paged(items, query):
+    page = int(query.get('page', ['0'])[0])
+    page_size = int(query.get('pageSize', ['10'])[0])
+    start = page * page_size
+    return {'total': len(items), 'page': page, 'pageSize': page_size, 'count': len(items[start:start + page_size]),
+            'results': items[start:start + page_size]}
+
+
+def _ticket(ticket_id):
+    return {'id': int(ticket_id), 'status': 'Review', 'createDate': '2022-01-01T00:00:00+0000',
+            'lastUpdated': '2022-01-01T00:00:00+0000',
+            'variables': {'summary': 'ticket {0}'.format(ticket_id), 'priority': 'LOW'},
+            'workflowPacketTasks': [{'id': 100 + int(ticket_id), 'workflowTask': {'id': 7, 'name': 'Review'}}]}
+
+
+class MockFireMon():
+    """ Holds the mock data and routes, start() serves them on a local port """
+
+    def __init__(self, latency: float = 0.0, devices: int = 10, rules: int = 1000, compress: bool = False,
+                 workers: int = None, slow_fraction: float = 0.0, slow_latency: float = 0.0, tickets: int = 50):
+        self.latency = latency
+        # a slow_fraction of the requests take slow_latency instead, like an occasional stalled server thread
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        # like the server's worker threads: requests beyond this many wait for a free worker
+        self.workers = threading.Semaphore(workers) if workers else None
+        self.compress = compress
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.devices = [{'id': i, 'name': 'fw-{0}'.format(i), 'managementIp': '10.0.0.{0}'.format(i),
+                         'devicePack': {'vendor': 'Palo Alto Networks', 'type': 'FIREWALL'}}
+                        for i in range(1, devices + 1)]
+        self.rules = [{'matchId': 'rule-{0}'.format(i), 'ruleName': 'rule-{0}'.format(i), 'ruleNumber': i,
+                       'action': 'ACCEPT', 'disabled': False, 'device': self.devices[i % devices],
+                       'srcContext': {'zones': [{'name': 'trust'}]}, 'dstContext': {'zones': [{'name': 'untrust'}]},
+                       'sources': [{'displayName': '10.{0}.0.0/16'.format(i % 250)}],
+                       'destinations': [{'displayName': 'any'}], 'services': [{'displayName': 'tcp/443'}]}
+                      for i in range(rules)]
+        self.supp_routes = {}
+        self.route_ids = itertools.count(1)
+        self.routes = [
+            ('POST', r'/securitymanager/api/authentication/login$', lambda m, q, b: {'token': 'mock-token'}),
+            ('POST', r'/securitymanager/api/authentication/logout$', lambda m, q, b: {}),
+            ('GET', r'/(policyplanner|policyoptimizer)/api/domain/\d+/workflow/version/latest/all$',
+             lambda m, q, b: {'total': 1, 'results': [{'workflow': {'id': 1, 'name': 'Access Req WF'}}]}),
+            ('GET', r'/securitymanager/api/domain/\d+/device$', lambda m, q, b: _paged(self.devices, q)),
+            ('GET', r'/securitymanager/api/domain/\d+/device/(\d+)$',
+             lambda m, q, b: self.devices[(int(m.group(1)) - 1) % devices]),
+            ('GET', r'/securitymanager/api/device/(\d+)/supplementalroute$',
+             lambda m, q, b: list(self.supp_routes.get(m.group(1), {}).values())),
+            ('POST', r'/securitymanager/api/device/(\d+)/supplementalroute$', self._add_supp_route),
+            ('DELETE', r'/securitymanager/api/device/(\d+)/supplementalroute/(\d+)$',
+             lambda m, q, b: self.supp_routes.get(m.group(1), {}).pop(int(m.group(2)), None) or {}),
+            ('GET', r'/securitymanager/api/siql/\w+/paged-search$', lambda m, q, b: _paged(self.rules, q)),
+            ('GET', r'/securitymanager/api/domain/\d+/device/\d+/rule/([^/]+)/ruledoc$',
+             lambda m, q, b: {'ruleId': m.group(1), 'props': []}),
+            ('GET', r'/securitymanager/api/domain/\d+/device/(\d+)/zoneobject/paged-search$',
+             lambda m, q, b: _paged([{'name': z, 'device': {'id': int(m.group(1))},
+                                      'interfaces': [{'name': 'eth{0}'.format(i)}]}
+                                     for i, z in enumerate(('trust', 'untrust', 'dmz'))], q)),
+            ('GET', r'/policyplanner/api/domain/\d+/workflow/\d+/packet/(\d+)$',
+             lambda m, q, b: _ticket(m.group(1))),
+            ('GET', r'/policyoptimizer/api/domain/\d+/workflow/\d+/packet/(\d+)$',
+             lambda m, q, b: _ticket(m.group(1))),
+            ('GET', r'/policyplanner/api/siql/domain/\d+/ticket/paged-search$',
+             lambda m, q, b: _paged([_ticket(i) for i in range(1, tickets + 1)], q)),
+            ('GET', r'/policyplanner/api/domain/\d+/workflow/\d+/packet/(\d+)/comments$',
+             lambda m, q, b: [{'id': 1, 'comment': 'approved for ticket {0}'.format(m.group(1))}]),
+            ('GET', r'/policyplanner/api/prechangeassessments/domain/\d+/workflow/\d+/packet/(\d+)/results$',
+             lambda m, q, b: {'ticketId': int(m.group(1)), 'results': []}),
+            ('GET', r'/policyplanner/api/policyplan/domain/\d+/workflow/\d+/task/\d+/packet/(\d+)/requirements$',
+             lambda m, q, b: {'results': [{'id': 1, 'sources': ['10.0.0.0/8'], 'destinations': ['192.168.1.10'],
+                                           'services': ['tcp/443'], 'action': 'ACCEPT'}]}),
+            ('GET', r'/policyoptimizer/api/siql/domain/\d+/review/paged-search$',
+             lambda m, q, b: _paged([_ticket(i) for i in range(1, 51)], q)),
+            ('POST', r'/policyplanner/api/policyplan/domain/\d+/workflow/\d+/task/\d+/packet/\d+/requirements$',
+             lambda m, q, b: {'received': len(b)}),
+            ('PUT', r'/policyoptimizer/api/domain/\d+/workflow/\d+/task/\d+/packet/\d+/packet-task/\d+/\w+',
+             lambda m, q, b: {}),
+        ]
+        self.server = None
+
+    def _add_supp_route(self, match, query, body):
+        route = dict(json.loads(body), id=next(self.route_ids), deviceId=int(match.group(1)))
+        self.supp_routes.setdefault(match.group(1), {})[route['id']] = route
+        return route
+
+    def handle(self, method: str, path: str, query: dict, body: bytes):
+        for route_method, pattern, handler in self.routes:
+            if route_method == method:
+                match = re.search(pattern, path)
+                if match:
+                    return 200, handler(match, query, body)
+        return 404, {'error': 'no mock for {0} {1}'.format(method, path)}
+
+    def start(self) -> str:
+        """
+        :return: base URL of the running server
+        """
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _serve(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                mock.bytes_received += len(body)
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                if mock.workers is not None:
+                    mock.workers.acquire()
+                try:
+                    if mock.slow_fraction and random.random() < mock.slow_fraction:
+                        time.sleep(mock.slow_latency)
+                    elif mock.latency:
+                        time.sleep(mock.latency)
+                    status, payload = mock.handle(self.command, url.path, parse_qs(url.query), body)
+                finally:
+                    if mock.workers is not None:
+                        mock.workers.release()
+                data = json.dumps(payload).encode()
+                gzipped = mock.compress and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+                if gzipped:
+                    data = gzip.compress(data, 6)
+                mock.requests += 1
+                mock.bytes_sent += len(data)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -9,6 +9,10 @@ VERSION = "0.2.2"
 # prerequisite: setuptools
 # http://pypi.python.org/pypi/setuptools
 REQUIRES = ["requests>=2.20.1"]
+EXTRAS = {
+    "export": ["pyarrow"],
+    "http2": ["httpx[http2]", "brotli"],
+}
 
 with open("README.md","r") as fh:
     long_description = fh.read()
@@ -22,7 +26,8 @@ setup(
     url="",
     keywords=["Security Manager APIs"],
     install_requires=REQUIRES,
-    python_requires ='>=3.6',
+    extras_require=EXTRAS,
+    python_requires ='>=3.7',
     packages=find_packages(where="src"),
     package_dir={'': 'src'},
     package_data={'':['*']},
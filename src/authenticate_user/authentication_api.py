@@ -1,4 +1,5 @@
 """ This module does user authentication """
+import threading
 import requests
 
 headers  = {
@@ -7,13 +8,15 @@ headers  = {
     }
 class Authentication():
 
-    def __init__(self,host,username,password,verify_ssl):
+    def __init__(self,host,username,password,verify_ssl,session=None):
         self.host=host
         self.username=username
         self.password=password
         self.verify_ssl=verify_ssl
         self.headers = ""
         self.BASE_AUTH_URL="{}/securitymanager/api/authentication/login"
+        self.lock = threading.Lock()
+        self.session = session if session is not None else requests
 
     def run_once(func):
         """ Restricts input func to be called only once """
@@ -34,7 +37,7 @@ class Authentication():
         payload={'username':self.username,'password': self.password}
         # Security manager url
         auth_url=self.BASE_AUTH_URL.format(self.host)
-        result=requests.post(auth_url,headers=headers,json=payload, verify=self.verify_ssl)
+        result=self.session.post(auth_url,headers=headers,json=payload, verify=self.verify_ssl)
         auth_token=result.json()
         self.headers = {
         'Content-Type': 'applicationjson',
@@ -43,4 +46,14 @@ class Authentication():
         }
         # print(auth_token.get('token'))
         return self.headers
-        
+
+    def get_headers(self):
+        """
+            Returns the authentication headers, logging in only on the first call. Safe to call from
+            several threads and from several API classes sharing this instance
+        """
+        if not self.headers:
+            with self.lock:
+                if not self.headers:
+                    self.get_auth_token()
+        return self.headers
@@ -0,0 +1 @@
+from security_manager_apis.client import FireMonClient
@@ -0,0 +1,86 @@
+""" Single entry point to all FireMon API classes, loading each subsystem on first use """
+import importlib
+import threading
+
+# attribute name: (module, class name, name of the workflow argument or None)
+SUBSYSTEMS = {
+    'security_manager': ('security_manager_apis.security_manager', 'SecurityManagerApis', None),
+    'policy_planner': ('security_manager_apis.policy_planner', 'PolicyPlannerApis', 'workflow_name'),
+    'policy_optimizer': ('security_manager_apis.policy_optimizer', 'PolicyOptimizerApis', 'po_workflow_name'),
+    'orchestration': ('security_manager_apis.orchestration_apis', 'OrchestrationApis', None),
+}
+
+
+class FireMonClient():
+    """ Facade over SecurityManagerApis, PolicyPlannerApis, PolicyOptimizerApis and OrchestrationApis.
+        Creating it imports nothing heavy and makes no request: each subsystem module (and requests) is
+        imported when the attribute is first accessed, and the login happens before its first API call.
+        All subsystems share a single login and connection pool """
+
+    def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str,
+                 workflow_name: str = None, po_workflow_name: str = None, suppress_ssl_warning=False,
+                 session=None):
+        """
+        :param host: FireMon server
+        :param username: API username
+        :param password: API password
+        :param verify_ssl: Verify the server certificate
+        :param domain_id: Domain ID
+        :param workflow_name: Policy Planner workflow name, required to use policy_planner
+        :param po_workflow_name: Policy Optimizer workflow name, required to use policy_optimizer
+        :param suppress_ssl_warning: Suppress SSL warnings
+        :param session: requests.Session (or compatible) shared by the subsystems, created on first use when None
+        """
+        self.host = host
+        self.username = username
+        self.password = password
+        self.verify_ssl = verify_ssl
+        self.domain_id = domain_id
+        self.workflow_name = workflow_name
+        self.po_workflow_name = po_workflow_name
+        self.suppress_ssl_warning = suppress_ssl_warning
+        self.session = session
+        self.api_instance = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only called when the attribute is not set yet, i.e. on first access of a subsystem
+        if name not in SUBSYSTEMS:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+        with self._lock:
+            # another thread may have created it while this one waited
+            if name in self.__dict__:
+                return self.__dict__[name]
+            module_name, class_name, workflow_arg = SUBSYSTEMS[name]
+            api_class = getattr(importlib.import_module(module_name), class_name)
+            args = [self.host, self.username, self.password, self.verify_ssl, self.domain_id]
+            if workflow_arg is not None:
+                workflow = getattr(self, workflow_arg)
+                if workflow is None:
+                    raise Exception("{0} is required to use {1}".format(workflow_arg, name))
+                args.append(workflow)
+            subsystem = api_class(*args, suppress_ssl_warning=self.suppress_ssl_warning, session=self.session)
+            if self.session is None:
+                self.session = subsystem.session
+            if self.api_instance is None:
+                self.api_instance = subsystem.api_instance
+            else:
+                subsystem.api_instance = self.api_instance
+            setattr(self, name, subsystem)
+            return subsystem
+
+    def loaded(self) -> list:
+        """
+        :return: names of the subsystems created so far
+        """
+        return [name for name in SUBSYSTEMS if name in self.__dict__]
+
+    def logout(self) -> list:
+        """
+        Ends the shared session if any subsystem has logged in
+        :return: Response code and reason, or None when no login happened
+        """
+        for name in self.loaded():
+            subsystem = self.__dict__[name]
+            if subsystem._headers is not None:
+                return subsystem.logout()
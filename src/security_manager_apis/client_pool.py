@@ -0,0 +1,156 @@
+""" Pool of FireMon clients across several hosts and domains with concurrent fan-out calls """
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+import authenticate_user
+from security_manager_apis.client import FireMonClient
+from security_manager_apis.get_properties_data import get_properties_data
+
+# methods whose URL has no domain ID: fan_out calls them once per host, with domain_id None in the results
+HOST_WIDE_METHODS = {
+    'security_manager': frozenset(('siql_query', 'get_fw_obj', 'add_supp_route', 'get_supp_routes',
+                                   'delete_supp_route')),
+}
+
+
+class ClientPool():
+    """ Manages one session (connection pool) and one login per host, and one FireMonClient per
+        (host, domain). Calls are fanned out to all targets in parallel with a concurrency cap per host """
+
+    def __init__(self, targets: list, credentials: dict, verify_ssl: bool = True, max_per_host: int = 8,
+                 workflow_names: dict = None, po_workflow_names: dict = None, suppress_ssl_warning=False,
+                 session_factory=None):
+        """
+        :param targets: list of (host, domain_id)
+        :param credentials: dict of host to (username, password)
+        :param verify_ssl: Verify server certificates
+        :param max_per_host: Maximum concurrent requests per host, also the size of its connection pool
+        :param workflow_names: optional dict of (host, domain_id) to Policy Planner workflow name
+        :param po_workflow_names: optional dict of (host, domain_id) to Policy Optimizer workflow name
+        :param suppress_ssl_warning: Suppress SSL warnings
+        :param session_factory: optional function called with the host and returning its session, e.g.
+                                lambda host: transport.create_session(http2=True, pool_maxsize=8). By default each
+                                host gets a requests.Session with a connection pool of max_per_host
+        """
+        missing = sorted(set(host for host, _ in targets) - set(credentials))
+        if missing:
+            raise Exception("No credentials for host(s): {0}".format(', '.join(missing)))
+        if suppress_ssl_warning == True:
+            requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+        self.targets = [(host, str(domain_id)) for host, domain_id in targets]
+        self.credentials = credentials
+        self.verify_ssl = verify_ssl
+        self.max_per_host = max_per_host
+        self.workflow_names = workflow_names or {}
+        self.po_workflow_names = po_workflow_names or {}
+        self.sessions = {}
+        self.logins = {}
+        self.semaphores = {}
+        self.clients = {}
+        self.lock = threading.Lock()
+        for host, _ in self.targets:
+            if host not in self.sessions:
+                session = session_factory(host) if session_factory is not None else self._default_session()
+                username, password = credentials[host]
+                self.sessions[host] = session
+                self.logins[host] = authenticate_user.Authentication(host, username, password, verify_ssl, session)
+                self.semaphores[host] = threading.BoundedSemaphore(max_per_host)
+
+    def _default_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def client(self, host: str, domain_id) -> FireMonClient:
+        """
+        Returns the client of a target, created on first use. Clients of the same host share its login
+        :param host: FireMon server
+        :param domain_id: Domain ID
+        :return: FireMonClient
+        """
+        key = (host, str(domain_id))
+        with self.lock:
+            if key not in self.clients:
+                username, password = self.credentials[host]
+                client = FireMonClient(host, username, password, self.verify_ssl, key[1],
+                                       workflow_name=self.workflow_names.get(key),
+                                       po_workflow_name=self.po_workflow_names.get(key),
+                                       session=self.sessions[host])
+                client.api_instance = self.logins[host]
+                self.clients[key] = client
+            return self.clients[key]
+
+    def call(self, host: str, domain_id, subsystem: str, method: str, *args, **kwargs):
+        """
+        Calling one API method on one target within the host's concurrency limit
+        :param host: FireMon server
+        :param domain_id: Domain ID
+        :param subsystem: security_manager, policy_planner, policy_optimizer or orchestration
+        :param method: name of the API method, e.g. 'siql_query'
+        :return: the method's return value
+        """
+        api = getattr(self.client(host, domain_id), subsystem)
+        with self.semaphores[host]:
+            return getattr(api, method)(*args, **kwargs)
+
+    def fan_out(self, subsystem: str, method: str, *args, targets: list = None, **kwargs):
+        """
+        Calling the same API method on every target concurrently, results are yielded as they complete.
+        Methods of HOST_WIDE_METHODS (e.g. siql_query) ignore the domain, they are called once per host through
+        its first target and their results have domain_id None: put the domain in the SIQL query to select it
+        :param subsystem: security_manager, policy_planner, policy_optimizer or orchestration
+        :param method: name of the API method, e.g. 'get_devices'
+        :param targets: optional subset of (host, domain_id), all targets by default
+        :return: generator of dicts with host, domain_id, result and error
+        """
+        targets = [(host, str(domain_id)) for host, domain_id in (targets or self.targets)]
+        host_wide = method in HOST_WIDE_METHODS.get(subsystem, ())
+        if host_wide:
+            first = {}
+            for host, domain_id in targets:
+                first.setdefault(host, (host, domain_id))
+            targets = list(first.values())
+        workers = max(1, min(len(targets), self.max_per_host * len(set(host for host, _ in targets))))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.call, host, domain_id, subsystem, method, *args, **kwargs): (host, domain_id)
+                       for host, domain_id in targets}
+            for future in as_completed(futures):
+                host, domain_id = futures[future]
+                if host_wide:
+                    domain_id = None
+                try:
+                    yield {'host': host, 'domain_id': domain_id, 'result': future.result(), 'error': None}
+                except Exception as e:
+                    yield {'host': host, 'domain_id': domain_id, 'result': None, 'error': e}
+
+    def fan_out_results(self, subsystem: str, method: str, *args, targets: list = None, **kwargs):
+        """
+        Same as fan_out for paged calls (siql_query, get_devices...), flattening each response's 'results'
+        :return: generator of (host, domain_id, record); failed targets are printed and skipped
+        """
+        for item in self.fan_out(subsystem, method, *args, targets=targets, **kwargs):
+            if item['error'] is not None:
+                print("Exception occurred while calling {0} on {1} domain {2}\n Exception : {3}".
+                      format(method, item['host'], item['domain_id'], item['error']))
+                continue
+            for record in (item['result'] or {}).get('results') or []:
+                yield item['host'], item['domain_id'], record
+
+    def close(self) -> dict:
+        """
+        Logging out of every host that was logged in and closing the sessions
+        :return: dict of host to logout response code
+        """
+        codes = {}
+        for host, login in self.logins.items():
+            if login.headers:
+                headers = dict(login.headers, Connection='Close')
+                url = get_properties_data().get('REST', 'logout_api_url').format(host)
+                try:
+                    codes[host] = self.sessions[host].post(url=url, headers=headers, verify=self.verify_ssl).status_code
+                except requests.exceptions.RequestException as e:
+                    print("Exception occurred while attempting to logout of {0}\n Exception : {1}".format(host, e))
+            self.sessions[host].close()
+        return codes
@@ -4,10 +4,14 @@ import os
 
 thisfolder = os.path.dirname(os.path.abspath(__file__))
 initfile = os.path.join(thisfolder, 'application.properties')
+_parser = None
 
 def get_properties_data():
     """ Returning a parser which will be used to read
-        application.properties file data """
-    parser = ConfigParser()
-    parser.read(initfile)
-    return parser
\ No newline at end of file
+        application.properties file data. The file is only parsed once per process """
+    global _parser
+    if _parser is None:
+        parser = ConfigParser()
+        parser.read(initfile)
+        _parser = parser
+    return _parser
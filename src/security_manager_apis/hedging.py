@@ -0,0 +1,181 @@
+""" Hedged requests for idempotent GET endpoints """
+import collections
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+def endpoint_key(url: str) -> str:
+    """
+    Grouping URLs by endpoint for the latency statistics, path segments containing digits (IDs, UUIDs) are
+    replaced by {}
+    :param url: request URL
+    :return: e.g. '/securitymanager/api/domain/{}/device/{}/rule/{}/ruledoc'
+    """
+    return re.sub(r'/[^/]*\d[^/]*(?=/|$)', '/{}', urlparse(url).path)
+
+
+class HedgedSession():
+    """ Session passed as the session argument of the API classes or FireMonClient, or returned from the
+        session_factory of ClientPool. An idempotent request that has not answered within the given percentile
+        of its endpoint's recent latencies is sent again; the first response wins and the other one is
+        cancelled if still queued, or closed when it arrives. Hedges draw on a budget of `budget` hedges per
+        request so the extra load stays bounded. Each primary runs on a thread of its own, so the session does
+        not cap concurrent requests, and its hedge delay counts from the moment it is sent. Both copies run in
+        the caller's context, so a scheduler.priority() block applies to an inner ScheduledSession """
+
+    def __init__(self, inner, percentile: float = 0.95, budget: float = 0.05, burst: int = 10,
+                 min_delay: float = 0.005, initial_delay: float = 0.5, min_samples: int = 20, window: int = 500,
+                 endpoints: str = None, max_workers: int = 32):
+        """
+        :param inner: requests.Session or a transport session sending the requests
+        :param percentile: Latency percentile of the endpoint after which a hedge is sent, e.g. 0.95
+        :param budget: Hedges allowed per request sent, e.g. 0.05 for at most 5% extra requests
+        :param burst: Hedges that can be spent at once when the budget has accumulated
+        :param min_delay: Shortest wait before hedging, in seconds
+        :param initial_delay: Wait before hedging while the endpoint has fewer than min_samples latencies
+        :param min_samples: Latencies needed before the percentile is used
+        :param window: Number of recent latencies kept per endpoint
+        :param endpoints: optional regex, only URLs matching it are hedged
+        :param max_workers: Threads sending hedges, primaries are not limited
+        """
+        self.inner = inner
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.endpoints = re.compile(endpoints) if endpoints else None
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.tokens = float(burst)
+        self.counters = {'requests': 0, 'hedges_fired': 0, 'hedges_won': 0, 'hedges_cancelled': 0,
+                         'budget_denied': 0}
+
+    def hedge_delay(self, key: str) -> float:
+        """
+        :param key: endpoint_key() of the URL
+        :return: seconds to wait for the first response before hedging
+        """
+        with self.lock:
+            samples = list(self.latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        samples.sort()
+        return max(self.min_delay, samples[min(len(samples) - 1, int(self.percentile * len(samples)))])
+
+    def _record(self, key: str, elapsed: float):
+        with self.lock:
+            if key not in self.latencies:
+                self.latencies[key] = collections.deque(maxlen=self.window)
+            self.latencies[key].append(elapsed)
+
+    def _take_token(self) -> bool:
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.counters['hedges_fired'] += 1
+                return True
+            self.counters['budget_denied'] += 1
+            return False
+
+    def _timed(self, key: str, method: str, url: str, kwargs: dict):
+        start = time.monotonic()
+        resp = self.inner.request(method, url, **kwargs)
+        self._record(key, time.monotonic() - start)
+        return resp
+
+    def _send_primary(self, key: str, method: str, url: str, kwargs: dict) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def send():
+            try:
+                future.set_result(self._timed(key, method, url, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        # one context copy per send: a context cannot be entered by two threads at once
+        threading.Thread(target=contextvars.copy_context().run, args=(send,), daemon=True).start()
+        return future
+
+    def _send_hedge(self, key: str, method: str, url: str, kwargs: dict) -> Future:
+        return self.pool.submit(contextvars.copy_context().run, self._timed, key, method, url, kwargs)
+
+    def request(self, method: str, url: str, **kwargs):
+        if method.upper() not in IDEMPOTENT_METHODS or (self.endpoints and not self.endpoints.search(url)):
+            return self.inner.request(method, url, **kwargs)
+        key = endpoint_key(url)
+        with self.lock:
+            self.counters['requests'] += 1
+            self.tokens = min(self.burst, self.tokens + self.budget)
+        primary = self._send_primary(key, method, url, kwargs)
+        done, _ = wait([primary], timeout=self.hedge_delay(key))
+        if done or not self._take_token():
+            return primary.result()
+        hedge = self._send_hedge(key, method, url, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in pending:
+                    self._cancel(loser)
+                if future is hedge:
+                    with self.lock:
+                        self.counters['hedges_won'] += 1
+                return future.result()
+        raise error
+
+    def _cancel(self, future):
+        if future.cancel():
+            with self.lock:
+                self.counters['hedges_cancelled'] += 1
+            return
+        # already on the wire: release its connection as soon as it answers
+        future.add_done_callback(self._close_response)
+
+    @staticmethod
+    def _close_response(future):
+        if future.exception() is None and hasattr(future.result(), 'close'):
+            future.result().close()
+
+    def stats(self) -> dict:
+        """
+        :return: requests, hedges_fired, hedges_won, hedges_cancelled, budget_denied and the current hedge delay
+                 of each endpoint in seconds
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            keys = list(self.latencies)
+        stats['hedge_delay'] = {key: self.hedge_delay(key) for key in keys}
+        return stats
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        self.inner.close()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
@@ -0,0 +1,43 @@
+""" Iterating over paged-search endpoints """
+
+
+def iter_pages(fetch_page, page_size: int):
+    """
+    Requesting pages until the reported total is reached, or until a short page when the server reports no total.
+    Raises when a response has no results list (error body, no response) or when the pages end before the total,
+    so a failed search is never taken for a complete one
+    :param fetch_page: function taking a page number (starting at 0) and returning the JSON response
+    :param page_size: Number of results requested per page
+    :return: generator of result lists, one per non-empty page
+    """
+    page = 0
+    fetched = 0
+    while True:
+        resp = fetch_page(page)
+        results = resp.get('results') if isinstance(resp, dict) else None
+        if not isinstance(results, list):
+            raise Exception("Page {0} of the search could not be retrieved: {1}".format(page, resp))
+        if results:
+            yield results
+        fetched += len(results)
+        total = resp.get('total')
+        if total is None:
+            if len(results) < page_size:
+                return
+        elif fetched >= total:
+            return
+        elif not results:
+            raise Exception("Search ended after {0} of {1} results on page {2}".format(fetched, total, page))
+        page += 1
+
+
+def fetch_all(fetch_page, page_size: int) -> list:
+    """
+    :param fetch_page: function taking a page number (starting at 0) and returning the JSON response
+    :param page_size: Number of results requested per page
+    :return: list of all results, raises like iter_pages
+    """
+    results = []
+    for page in iter_pages(fetch_page, page_size):
+        results.extend(page)
+    return results
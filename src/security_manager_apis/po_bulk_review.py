@@ -0,0 +1,128 @@
+""" Bulk processing of Policy Optimizer review tickets """
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from security_manager_apis.paging import iter_pages
+from security_manager_apis.rate_limit import RateLimiter, host_limiter
+
+ACTIONS = ('assign', 'complete', 'cancel')
+
+
+class BulkReviewEngine():
+    """ Applies assign/complete/cancel decisions to many Policy Optimizer tickets. Each ticket is fetched once
+        and its JSON reused by every action, tickets are processed in parallel under a per-host rate limit """
+
+    def __init__(self, optimizer, max_workers: int = 16, rate_per_second: float = 20, page_size: int = 500,
+                 limiter: RateLimiter = None):
+        """
+        :param optimizer: PolicyOptimizerApis instance
+        :param max_workers: Number of tickets processed in parallel
+        :param rate_per_second: Requests per second allowed against the host, shared with other engines using
+                                the same rate. Raises if another engine set a different rate for the host
+        :param page_size: Number of results requested per page when selecting tickets
+        :param limiter: optional RateLimiter used instead of the shared host limiter, rate_per_second is ignored
+        """
+        self.optimizer = optimizer
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.limiter = limiter if limiter is not None else host_limiter(optimizer.host, rate_per_second)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def select(self, siql_query: str) -> list:
+        """
+        Selecting tickets with siql_query_po_ticket
+        :param siql_query: SIQL query, e.g. "review { workflow = 1 AND status ~ 'Review' }"
+        :return: list of ticket IDs
+        """
+        ids = []
+        for page in iter_pages(lambda p: self._call(self.optimizer.siql_query_po_ticket,
+                                                    {'q': siql_query, 'pageSize': self.page_size, 'page': p,
+                                                     'domainId': self.optimizer.domain_id}),
+                               self.page_size):
+            ids.extend(str(t['id']) for t in page)
+        return ids
+
+    def _call(self, func, *args, **kwargs):
+        self.limiter.acquire()
+        with self.lock:
+            self.requests += 1
+        return func(*args, **kwargs)
+
+    def assign(self, tickets, user_id: str) -> dict:
+        """
+        :param tickets: list of ticket IDs or a SIQL query string
+        :param user_id: ID of user to assign
+        :return: report, see run()
+        """
+        return self.run(tickets, [('assign', user_id)])
+
+    def complete(self, tickets, decision: dict) -> dict:
+        """
+        :param tickets: list of ticket IDs or a SIQL query string
+        :param decision: Certify/Decertify JSON as in complete_po_ticket
+        :return: report, see run()
+        """
+        return self.run(tickets, [('complete', decision)])
+
+    def cancel(self, tickets) -> dict:
+        """
+        :param tickets: list of ticket IDs or a SIQL query string
+        :return: report, see run()
+        """
+        return self.run(tickets, [('cancel', None)])
+
+    def run(self, tickets, actions) -> dict:
+        """
+        Applying actions to every ticket, e.g. run(ids, [('assign', '5'), ('complete', decision)])
+        :param tickets: list of ticket IDs or a SIQL query string selecting them
+        :param actions: list of (action, argument) applied in order, or a dict of ticket ID to such a
+                        list for per-ticket decisions. Actions: assign (user ID), complete (decision JSON), cancel
+        :return: dict with outcomes (one per ticket), succeeded, failed, seconds, tickets_per_second and requests
+        """
+        start = time.time()
+        requests_before = self.requests
+        if isinstance(tickets, str):
+            tickets = self.select(tickets)
+        tickets = [str(t) for t in tickets]
+        if not isinstance(actions, dict):
+            actions = {ticket_id: actions for ticket_id in tickets}
+        for steps in actions.values():
+            for action, _ in steps:
+                if action not in ACTIONS:
+                    raise Exception("Unknown action '{0}'. Options: {1}".format(action, ', '.join(ACTIONS)))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            outcomes = list(pool.map(lambda t: self._process(t, actions.get(t, [])), tickets))
+        seconds = time.time() - start
+        succeeded = sum(1 for o in outcomes if o['ok'])
+        return {
+            'outcomes': outcomes,
+            'succeeded': succeeded,
+            'failed': len(outcomes) - succeeded,
+            'seconds': seconds,
+            'tickets_per_second': len(outcomes) / seconds if seconds else 0.0,
+            'requests': self.requests - requests_before,
+        }
+
+    def _process(self, ticket_id: str, steps: list) -> dict:
+        start = time.time()
+        outcome = {'ticket_id': ticket_id, 'ok': True, 'results': [], 'error': None}
+        try:
+            ticket_json = self._call(self.optimizer.get_po_ticket, ticket_id)
+            for action, argument in steps:
+                if action == 'assign':
+                    status = self._call(self.optimizer.assign_po_ticket, ticket_id, argument, ticket_json=ticket_json)
+                elif action == 'complete':
+                    status = self._call(self.optimizer.complete_po_ticket, ticket_id, argument,
+                                        ticket_json=ticket_json)
+                else:
+                    status = self._call(self.optimizer.cancel_po_ticket, ticket_id, ticket_json=ticket_json)
+                outcome['results'].append((action, status))
+                if status is None or not 200 <= int(status) < 300:
+                    outcome['ok'] = False
+                    break
+        except Exception as e:
+            outcome['ok'] = False
+            outcome['error'] = str(e)
+        outcome['seconds'] = time.time() - start
+        return outcome
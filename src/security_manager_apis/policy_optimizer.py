@@ -2,10 +2,12 @@ import json
 import requests
 import authenticate_user
 from security_manager_apis.get_properties_data import get_properties_data
+from security_manager_apis.responses import check_status
 
 class PolicyOptimizerApis():
 
-    def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str, workflow_name: str, suppress_ssl_warning=False):
+    def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str, workflow_name: str, suppress_ssl_warning=False,
+                 session=None):
         """ User needs to pass host,username,password,and verify_ssl as parameters while
             creating instance of this class and internally Authentication class instance
             will be created which will set authentication token in the header to get firemon API access
@@ -13,13 +15,37 @@ class PolicyOptimizerApis():
         if suppress_ssl_warning == True:
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
         self.parser = get_properties_data()
-        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl)
-        self.headers = self.api_instance.get_auth_token()
+        self.session = session if session is not None else requests.Session()
+        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl, self.session)
+        self._headers = None
         self.host = host
         self.verify_ssl = verify_ssl
         self.api_resp = ''
         self.domain_id = domain_id
-        self.workflow_id = self.get_workflow_id_by_workflow_name(domain_id, workflow_name)
+        self.workflow_name = workflow_name
+        self._workflow_id = None
+
+    @property
+    def headers(self) -> dict:
+        """ Authentication headers, the login request is only made before the first API call """
+        if self._headers is None:
+            self._headers = dict(self.api_instance.get_headers())
+        return self._headers
+
+    @headers.setter
+    def headers(self, value: dict):
+        self._headers = value
+
+    @property
+    def workflow_id(self) -> str:
+        """ Workflow ID for workflow_name, looked up before the first API call that needs it """
+        if self._workflow_id is None:
+            self._workflow_id = self.get_workflow_id_by_workflow_name(self.domain_id, self.workflow_name)
+        return self._workflow_id
+
+    @workflow_id.setter
+    def workflow_id(self, value: str):
+        self._workflow_id = value
 
     def create_po_ticket(self, request_body: dict) -> str:
         """
@@ -29,84 +55,93 @@ class PolicyOptimizerApis():
         """
         po_tkt_url = self.parser.get('REST', 'create_po_ticket').format(self.host, self.domain_id)
         try:
-            resp = requests.post(url=po_tkt_url,
+            resp = self.session.post(url=po_tkt_url,
                                  headers=self.headers, json=request_body, verify=self.verify_ssl)
             return resp.status_code
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while creating Policy Optimizer ticket with workflow id '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def get_po_ticket(self, ticket_id: str) -> str:
+    def get_po_ticket(self, ticket_id: str, raise_errors: bool = False) -> str:
         """
         Function to retrieve Policy Optimizer ticket JSON
         :param ticket_id: ID of ticket
+        :param raise_errors: Raise when the server answers with an error instead of returning its JSON
         :return: JSON of ticket
         """
         po_tkt_url = self.parser.get('REST', 'get_po_ticket').format(self.host, self.domain_id, self.workflow_id, ticket_id)
         try:
-            resp = requests.get(url=po_tkt_url,
+            resp = self.session.get(url=po_tkt_url,
                                  headers=self.headers, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "Policy Optimizer ticket '{0}'".format(ticket_id))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while creating Policy Optimizer ticket with workflow id '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def assign_po_ticket(self, ticket_id: str, user_id: str) -> str:
+    def assign_po_ticket(self, ticket_id: str, user_id: str, ticket_json: dict = None) -> str:
         """
         Function to assign user to Policy Optimizer ticket
         :param ticket_id: ID of ticket
         :param user_id: ID of user
+        :param ticket_json: Ticket JSON from get_po_ticket, fetched when not provided
         :return: Response code
         """
-        ticket_json = self.get_po_ticket(ticket_id)
+        if ticket_json is None:
+            ticket_json = self.get_po_ticket(ticket_id)
         workflow_packet_task_id = self.get_workflow_packet_task_id(ticket_json)
         workflow_task_id = self.get_workflow_task_id(ticket_json)
         po_tkt_url = self.parser.get('REST', 'assign_po_ticket').format(self.host, self.domain_id,
                                                                              self.workflow_id, workflow_task_id,
                                                                              ticket_id, workflow_packet_task_id)
         try:
-            resp = requests.put(url=po_tkt_url,
+            resp = self.session.put(url=po_tkt_url,
                                  headers=self.headers, data=user_id, verify=self.verify_ssl)
             return resp.status_code
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while creating Policy Optimizer ticket with workflow id '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def complete_po_ticket(self, ticket_id: str, decision: dict) -> str:
+    def complete_po_ticket(self, ticket_id: str, decision: dict, ticket_json: dict = None) -> str:
         """
         Function to complete a Policy Optimizer ticket
         :param ticket_id: ID of ticket
         :param decision: Decision JSON
+        :param ticket_json: Ticket JSON from get_po_ticket, fetched when not provided
         :return: Response code
         """
-        ticket_json = self.get_po_ticket(ticket_id)
+        if ticket_json is None:
+            ticket_json = self.get_po_ticket(ticket_id)
         workflow_packet_task_id = self.get_workflow_packet_task_id(ticket_json)
         workflow_task_id = self.get_workflow_task_id(ticket_json)
         po_tkt_url = self.parser.get('REST', 'complete_po_ticket').format(self.host, self.domain_id,
                                                                              self.workflow_id, workflow_task_id,
                                                                              ticket_id, workflow_packet_task_id, 'complete')
         try:
-            resp = requests.put(url=po_tkt_url,
+            resp = self.session.put(url=po_tkt_url,
                                  headers=self.headers, json=decision, verify=self.verify_ssl)
             return resp.status_code
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while completing Policy Optimizer ticket with ticket id '{0}'\n Exception : {1}".
                   format(ticket_id, e.response.text))
 
-    def cancel_po_ticket(self, ticket_id: str) -> str:
+    def cancel_po_ticket(self, ticket_id: str, ticket_json: dict = None) -> str:
         """
         Function to cancel a Policy Optimizer ticket
         :param ticket_id: ID of ticket
+        :param ticket_json: Ticket JSON from get_po_ticket, fetched when not provided
         :return: Response code
         """
-        ticket_json = self.get_po_ticket(ticket_id)
+        if ticket_json is None:
+            ticket_json = self.get_po_ticket(ticket_id)
         workflow_packet_task_id = self.get_workflow_packet_task_id(ticket_json)
         workflow_task_id = self.get_workflow_task_id(ticket_json)
         po_tkt_url = self.parser.get('REST', 'complete_po_ticket').format(self.host, self.domain_id,
                                                                              self.workflow_id, workflow_task_id,
                                                                              ticket_id, workflow_packet_task_id, 'cancelled')
         try:
-            resp = requests.put(url=po_tkt_url,
+            resp = self.session.put(url=po_tkt_url,
                                  headers=self.headers, json={}, verify=self.verify_ssl)
             return resp.status_code
         except requests.exceptions.HTTPError as e:
@@ -121,7 +156,7 @@ class PolicyOptimizerApis():
         """
         po_tkt_url = self.parser.get('REST', 'siql_query_po').format(self.host, self.domain_id)
         try:
-            resp = requests.get(url=po_tkt_url,
+            resp = self.session.get(url=po_tkt_url,
                                  headers=self.headers, params=parameters, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
@@ -132,7 +167,7 @@ class PolicyOptimizerApis():
         self.headers['Connection'] = 'Close'
         pp_tkt_url = self.parser.get('REST', 'logout_api_url').format(self.host)
         try:
-            resp = requests.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
             print(
@@ -169,7 +204,7 @@ class PolicyOptimizerApis():
         workflow_url = self.parser.get('REST', 'find_all_po_workflows_url').format(self.host, domain_id)
         try:
 
-            self.api_resp = requests.get(url=workflow_url, headers=self.headers, verify=self.verify_ssl)
+            self.api_resp = self.session.get(url=workflow_url, headers=self.headers, verify=self.verify_ssl)
             count_of_workflows = self.api_resp.json().get('total')
 
             # Here, default pageSize is 10
@@ -177,7 +212,7 @@ class PolicyOptimizerApis():
             # CASE 2 :No need to make a second call if total workflows < 10 as we already have all of them
             if (count_of_workflows > 10):
                 parameters = {'includeDisabled': False, 'pageSize': count_of_workflows}
-                self.api_resp = requests.get(url=workflow_url, headers=self.headers, params=parameters,
+                self.api_resp = self.session.get(url=workflow_url, headers=self.headers, params=parameters,
                                              verify=self.verify_ssl)
 
             list_of_workflows = self.api_resp.json().get('results')
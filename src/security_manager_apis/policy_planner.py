@@ -2,12 +2,13 @@ import json
 import requests
 import authenticate_user
 from security_manager_apis.get_properties_data import get_properties_data
+from security_manager_apis.responses import check_status
 
 
 class PolicyPlannerApis():
 
     def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str, workflow_name: str,
-                 suppress_ssl_warning=False):
+                 suppress_ssl_warning=False, session=None):
         """ User needs to pass host,username,password,and verify_ssl as parameters while
             creating instance of this class and internally Authentication class instance
             will be created which will set authentication token in the header to get firemon API access
@@ -15,13 +16,37 @@ class PolicyPlannerApis():
         if suppress_ssl_warning == True:
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
         self.parser = get_properties_data()
-        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl)
-        self.headers = self.api_instance.get_auth_token()
+        self.session = session if session is not None else requests.Session()
+        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl, self.session)
+        self._headers = None
         self.host = host
         self.verify_ssl = verify_ssl
         self.api_resp = ''
         self.domain_id = domain_id
-        self.workflow_id = self.get_workflow_id_by_workflow_name(domain_id, workflow_name)
+        self.workflow_name = workflow_name
+        self._workflow_id = None
+
+    @property
+    def headers(self) -> dict:
+        """ Authentication headers, the login request is only made before the first API call """
+        if self._headers is None:
+            self._headers = dict(self.api_instance.get_headers())
+        return self._headers
+
+    @headers.setter
+    def headers(self, value: dict):
+        self._headers = value
+
+    @property
+    def workflow_id(self) -> str:
+        """ Workflow ID for workflow_name, looked up before the first API call that needs it """
+        if self._workflow_id is None:
+            self._workflow_id = self.get_workflow_id_by_workflow_name(self.domain_id, self.workflow_name)
+        return self._workflow_id
+
+    @workflow_id.setter
+    def workflow_id(self, value: str):
+        self._workflow_id = value
 
     def create_pp_ticket(self, request_body: dict) -> dict:
         """
@@ -32,23 +57,27 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'create_pp_tkt_api_url').format(self.host, self.domain_id,
                                                                              self.workflow_id)
         try:
-            resp = requests.post(url=pp_tkt_url,
+            resp = self.session.post(url=pp_tkt_url,
                                  headers=self.headers, json=request_body, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while creating policy planner ticket with workflow id '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def siql_query_pp_ticket(self, siql_query: str, page_size: int) -> dict:
+    def siql_query_pp_ticket(self, siql_query: str, page_size: int, page: int = None) -> dict:
         """
         Making a SIQL Query to search for Policy Planner tickets
         :param siql_query: SIQL query
+        :param page_size: Number of results to return
+        :param page: Page number to return, starting at 0. Omitted by default
         :return: JSON of results
         """
         pp_tkt_url = self.parser.get('REST', 'siql_query_pp_tkt_api').format(self.host, self.domain_id)
         parameters = {'q': siql_query, 'pageSize': page_size, 'domainid': self.domain_id}
+        if page is not None:
+            parameters['page'] = page
         try:
-            resp = requests.get(url=pp_tkt_url,
+            resp = self.session.get(url=pp_tkt_url,
                                 headers=self.headers, params=parameters, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
@@ -65,24 +94,27 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'update_pp_tkt_api_url').format(self.host, self.domain_id,
                                                                              self.workflow_id, ticket_id)
         try:
-            resp = requests.put(url=pp_tkt_url,
+            resp = self.session.put(url=pp_tkt_url,
                                 headers=self.headers, json=request_body, verify=self.verify_ssl)
             return str(resp.status_code)
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while creating policy planner ticket with workflow id '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def pull_pp_ticket(self, ticket_id: str) -> dict:
+    def pull_pp_ticket(self, ticket_id: str, raise_errors: bool = False) -> dict:
         """
         making call to retrieve pp ticket api which retrieves a policy planner ticket on corresponding FMOS box
         :param ticket_id: ID of ticket
+        :param raise_errors: Raise when the server answers with an error instead of returning its JSON
         :return: JSON of ticket
         """
         pp_tkt_url = self.parser.get('REST', 'pull_pp_tkt_api_url').format(self.host, self.domain_id, self.workflow_id,
                                                                            ticket_id)
         try:
-            resp = requests.get(url=pp_tkt_url,
+            resp = self.session.get(url=pp_tkt_url,
                                 headers=self.headers, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "Ticket '{0}'".format(ticket_id))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while retrieving policy planner ticket with workflow id '{0}'\n Exception : {1}".
@@ -98,7 +130,7 @@ class PolicyPlannerApis():
                                                                              self.workflow_id, workflow_task_id,
                                                                              ticket_id, workflow_packet_task_id)
         try:
-            resp = requests.put(url=pp_tkt_url,
+            resp = self.session.put(url=pp_tkt_url,
                                 headers=self.headers, data=user_id, verify=self.verify_ssl)
             return str(resp.status_code)
         except requests.exceptions.HTTPError as e:
@@ -112,7 +144,7 @@ class PolicyPlannerApis():
                                                                               self.workflow_id,
                                                                               workflow_task_id, ticket_id)
         try:
-            resp = requests.post(url=pp_tkt_url,
+            resp = self.session.post(url=pp_tkt_url,
                                  headers=self.headers, json=req_json, verify=self.verify_ssl)
             return str(resp.status_code)
         except requests.exceptions.HTTPError as e:
@@ -133,7 +165,7 @@ class PolicyPlannerApis():
                                                                             workflow_task_id, ticket_id,
                                                                             workflow_packet_task_id, button_action)
         try:
-            resp = requests.put(url=pp_tkt_url,
+            resp = self.session.put(url=pp_tkt_url,
                                 headers=self.headers, json={}, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
@@ -156,7 +188,7 @@ class PolicyPlannerApis():
                                                                           ticket_id, controls_formatted,
                                                                           enable_risk_sa)
         try:
-            resp = requests.post(url=pp_tkt_url,
+            resp = self.session.post(url=pp_tkt_url,
                                  headers=self.headers, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
@@ -164,16 +196,19 @@ class PolicyPlannerApis():
                 "Exception occurred while running PCA on policy planner ticket with workflow id '{0}'\n Exception : {1}".
                     format(workflow_id, e.response.text))
 
-    def retrieve_pca(self, ticket_id: str) -> dict:
+    def retrieve_pca(self, ticket_id: str, raise_errors: bool = False) -> dict:
         """
         :param ticket_id: Ticket ID as string
+        :param raise_errors: Raise when the server answers with an error instead of returning its JSON
         :return: JSON response of PCA
         """
         pp_tkt_url = self.parser.get('REST', 'get_pca_pp_tkt_api').format(self.host, self.domain_id, self.workflow_id,
                                                                           ticket_id)
         try:
-            resp = requests.get(url=pp_tkt_url,
+            resp = self.session.get(url=pp_tkt_url,
                                 headers=self.headers, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "PCA results of ticket '{0}'".format(ticket_id))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print(
@@ -211,7 +246,7 @@ class PolicyPlannerApis():
         new_headers = self.headers
         new_headers['Content-Type'] = 'multipart/form-data'
         try:
-            resp = requests.post(url=pp_tkt_url, headers=new_headers, files={file_name: f}, verify=self.verify_ssl)
+            resp = self.session.post(url=pp_tkt_url, headers=new_headers, files={file_name: f}, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print(
@@ -224,7 +259,7 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'post_att_pp_tkt_api').format(self.host, self.domain_id, self.workflow_id,
                                                                            ticket_id)
         try:
-            resp = requests.put(url=pp_tkt_url,
+            resp = self.session.put(url=pp_tkt_url,
                                 headers=new_headers, json=attachment_json, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
@@ -242,7 +277,7 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'parse_csv_pp_tkt_api').format(self.host, self.domain_id, self.workflow_id)
         self.headers['Content-Type'] = 'multipart/form-data'
         try:
-            resp = requests.post(url=pp_tkt_url, headers=self.headers, files={file_name: f}, verify=self.verify_ssl)
+            resp = self.session.post(url=pp_tkt_url, headers=self.headers, files={file_name: f}, verify=self.verify_ssl)
         except requests.exceptions.HTTPError as e:
             print(
                 "Exception occurred while adding attachment to policy planner ticket with workflow id '{0}'\n Exception : {1}".
@@ -258,20 +293,25 @@ class PolicyPlannerApis():
         self.add_attachment(ticket_id, file_name, f, 'Attached original CSV file')
         return post_req
 
-    def get_reqs(self, ticket_id: str) -> dict:
+    def get_reqs(self, ticket_id: str, ticket_json: dict = None, raise_errors: bool = False) -> dict:
         """
         Retrieves JSON of requirements for ticket
         :param ticket_id: Ticket ID
+        :param ticket_json: Ticket JSON from pull_pp_ticket, fetched when not provided
+        :param raise_errors: Raise when the server answers with an error instead of returning its JSON
         :return: JSON of requirements
         """
-        ticket_json = self.pull_pp_ticket(ticket_id)
+        if ticket_json is None:
+            ticket_json = self.pull_pp_ticket(ticket_id, raise_errors=raise_errors)
         workflow_task_id = self.get_workflow_task_id(ticket_json)
         pp_tkt_url = self.parser.get('REST', 'get_recs_pp_tkt_api').format(self.host, self.domain_id, self.workflow_id,
                                                                            workflow_task_id,
                                                                            ticket_id)
         try:
-            resp = requests.get(url=pp_tkt_url,
+            resp = self.session.get(url=pp_tkt_url,
                                 headers=self.headers, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "Requirements of ticket '{0}'".format(ticket_id))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print(
@@ -293,7 +333,7 @@ class PolicyPlannerApis():
                                                                                self.workflow_id, workflow_task_id,
                                                                                ticket_id, str(r['id']))
             try:
-                resp = requests.delete(url=pp_tkt_url,
+                resp = self.session.delete(url=pp_tkt_url,
                                        headers=self.headers, verify=self.verify_ssl)
             except requests.exceptions.HTTPError as e:
                 print(
@@ -306,7 +346,7 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'app_req_pp_tkt_api').format(self.host, self.domain_id, self.workflow_id,
                                                                           ticket_id, req_id)
         try:
-            resp = requests.put(url=pp_tkt_url,
+            resp = self.session.put(url=pp_tkt_url,
                                 headers=self.headers, json={}, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
@@ -328,7 +368,7 @@ class PolicyPlannerApis():
                                                                               self.workflow_id, workflow_task_id,
                                                                               ticket_id, req_id)
         try:
-            resp = requests.post(url=pp_tkt_url,
+            resp = self.session.post(url=pp_tkt_url,
                                 headers=self.headers, json=change, verify=self.verify_ssl)
             return resp.status_code, resp.reason, resp.json()
         except requests.exceptions.HTTPError as e:
@@ -343,7 +383,7 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'add_comment_pp_tkt_api').format(self.host, self.domain_id,
                                                                               self.workflow_id, ticket_id)
         try:
-            resp = requests.post(url=pp_tkt_url,
+            resp = self.session.post(url=pp_tkt_url,
                                  headers=self.headers, json=comment_json, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
@@ -351,12 +391,14 @@ class PolicyPlannerApis():
                 "Exception occurred while adding comment on policy planner ticket with workflow id '{0}'\n Exception : {1}".
                     format(workflow_id, e.response.text))
 
-    def get_comments(self, ticket_id: str) -> dict:
+    def get_comments(self, ticket_id: str, raise_errors: bool = False) -> dict:
         pp_tkt_url = self.parser.get('REST', 'get_comments_pp_tkt_api').format(self.host, self.domain_id,
                                                                                self.workflow_id, ticket_id)
         try:
-            resp = requests.get(url=pp_tkt_url,
+            resp = self.session.get(url=pp_tkt_url,
                                 headers=self.headers, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "Comments of ticket '{0}'".format(ticket_id))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print(
@@ -367,7 +409,7 @@ class PolicyPlannerApis():
         pp_tkt_url = self.parser.get('REST', 'del_comment_pp_tkt_api').format(self.host, self.domain_id,
                                                                               self.workflow_id, ticket_id, comment_id)
         try:
-            resp = requests.delete(url=pp_tkt_url,
+            resp = self.session.delete(url=pp_tkt_url,
                                    headers=self.headers, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
@@ -379,7 +421,7 @@ class PolicyPlannerApis():
         self.headers['Connection'] = 'Close'
         pp_tkt_url = self.parser.get('REST', 'logout_api_url').format(self.host)
         try:
-            resp = requests.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
             print(
@@ -416,7 +458,7 @@ class PolicyPlannerApis():
         workflow_url = self.parser.get('REST', 'find_all_workflows_url').format(self.host, domain_id)
         try:
 
-            self.api_resp = requests.get(url=workflow_url, headers=self.headers, verify=self.verify_ssl)
+            self.api_resp = self.session.get(url=workflow_url, headers=self.headers, verify=self.verify_ssl)
             count_of_workflows = self.api_resp.json().get('total')
 
             # Here, default pageSize is 10
@@ -424,7 +466,7 @@ class PolicyPlannerApis():
             # CASE 2 :No need to make a second call if total workflows < 10 as we already have all of them
             if (count_of_workflows > 10):
                 parameters = {'includeDisabled': False, 'pageSize': count_of_workflows}
-                self.api_resp = requests.get(url=workflow_url, headers=self.headers, params=parameters,
+                self.api_resp = self.session.get(url=workflow_url, headers=self.headers, params=parameters,
                                              verify=self.verify_ssl)
 
             list_of_workflows = self.api_resp.json().get('results')
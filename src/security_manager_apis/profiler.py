@@ -0,0 +1,291 @@
+""" Built-in sampling profiler attributing client CPU time and allocations to API methods and endpoints.
+    CPU time per call is measured with time.thread_time (Python 3.7+) """
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from security_manager_apis.hedging import endpoint_key
+
+# Innermost Python frames of a thread blocked in I/O or on a lock; in 'cpu' mode these samples are dropped.
+# The sampler only sees Python frames, so this is an approximation of on-CPU time
+BLOCKING_FRAMES = frozenset((
+    ('socket.py', 'readinto'), ('socket.py', 'create_connection'), ('socket.py', 'accept'),
+    ('ssl.py', 'read'), ('ssl.py', 'recv_into'), ('ssl.py', 'do_handshake'),
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('selectors.py', 'select'),
+    ('wait.py', 'do_poll'), ('wait.py', 'do_select'), ('_backends/sync.py', 'read'),
+))
+
+
+def _frame_name(code) -> str:
+    return '{0}:{1}'.format(os.path.basename(code.co_filename), getattr(code, 'co_qualname', code.co_name))
+
+
+def _blocking(code) -> bool:
+    path = code.co_filename.replace(os.sep, '/')
+    return any(path.endswith('/' + name) and code.co_name == function for name, function in BLOCKING_FRAMES)
+
+
+def _line_range(code) -> tuple:
+    lines = [line for _, _, line in code.co_lines() if line is not None] if hasattr(code, 'co_lines') else []
+    return code.co_firstlineno, max(lines + [code.co_firstlineno])
+
+
+def _instrumented(profiler, label: str, func):
+    def call(*args, **kwargs):
+        stack = profiler._stack()
+        stack.append(label)
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            cpu = time.thread_time() - cpu_start
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            profiler._count_call(label, elapsed, cpu)
+    call.__wrapped__ = func
+    return call
+
+
+_WRAPPER_CODE = _instrumented(None, None, None).__code__
+
+
+class Profiler():
+    """ Samples the stacks of threads inside instrumented API calls every `interval` seconds and, optionally,
+        diffs tracemalloc snapshots every `snapshot_every` seconds. Stacks start at the outermost API method,
+        API methods appear as '[api] Class.method' and HTTP calls as '[http] METHOD /endpoint/{}', so the
+        collapsed output (one 'frame;frame;... count' line per stack) feeds flamegraph.pl or speedscope """
+
+    def __init__(self, interval: float = 0.005, mode: str = 'cpu', trace_allocations: bool = False,
+                 snapshot_every: float = 1.0, tracemalloc_frames: int = 16):
+        """
+        :param interval: Seconds between stack samples
+        :param mode: 'cpu' drops samples of threads blocked in I/O or on locks, 'wall' keeps every sample
+        :param trace_allocations: Trace allocations with tracemalloc while the profiler runs. Every allocation
+                                  gets slower, more so with more frames: enable it for short windows
+        :param snapshot_every: Seconds between tracemalloc snapshots
+        :param tracemalloc_frames: Frames kept per allocation traceback, allocations whose kept frames do not
+                                   reach an instrumented method are not attributed
+        """
+        if mode not in ('cpu', 'wall'):
+            raise Exception("Profiler mode must be 'cpu' or 'wall', not '{0}'".format(mode))
+        self.interval = interval
+        self.mode = mode
+        self.trace_allocations = trace_allocations
+        self.snapshot_every = snapshot_every
+        self.tracemalloc_frames = tracemalloc_frames
+        self.lock = threading.Lock()
+        self.stacks = {}
+        self.cpu_samples = collections.Counter()
+        self.alloc_stacks = collections.Counter()
+        self.calls = collections.Counter()
+        self.call_seconds = collections.Counter()
+        self.call_cpu_seconds = collections.Counter()
+        self.samples = 0
+        self.code_ranges = {}
+        self.wrapped_codes = set()
+        self.patched = []
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.last_snapshot = None
+        self.started_tracemalloc = False
+
+    def _stack(self) -> list:
+        ident = threading.get_ident()
+        stack = self.stacks.get(ident)
+        if stack is None:
+            stack = self.stacks[ident] = []
+        return stack
+
+    def _count_call(self, label: str, elapsed: float, cpu: float):
+        with self.lock:
+            self.calls[label] += 1
+            self.call_seconds[label] += elapsed
+            self.call_cpu_seconds[label] += cpu
+
+    def instrument(self, *apis):
+        """
+        Wrapping the public methods of API instances (SecurityManagerApis, PolicyPlannerApis... or subsystems
+        of a FireMonClient) and the request method of their sessions
+        :param apis: API class instances
+        :return: self
+        """
+        for api in apis:
+            cls = type(api)
+            for name, func in vars(cls).items():
+                if name.startswith('_') or not callable(func) or isinstance(func, (staticmethod, classmethod)):
+                    continue
+                label = '[api] {0}.{1}'.format(cls.__name__, name)
+                setattr(api, name, _instrumented(self, label, getattr(api, name)))
+                self.patched.append((api, name))
+                self.wrapped_codes.add(func.__code__)
+                self.code_ranges.setdefault(func.__code__.co_filename, []).append(
+                    _line_range(func.__code__) + (label,))
+            session = getattr(api, 'session', None)
+            if session is not None and 'request' not in vars(session):
+                session.request = self._instrument_session(session.request)
+                self.patched.append((session, 'request'))
+        return self
+
+    def _instrument_session(self, request):
+        def profiled_request(method, url, *args, **kwargs):
+            label = '[http] {0} {1}'.format(method.upper(), endpoint_key(url))
+            return _instrumented(self, label, request)(method, url, *args, **kwargs)
+        return profiled_request
+
+    def uninstrument(self):
+        """ Removing every wrapper installed by instrument() """
+        for obj, name in reversed(self.patched):
+            if name in vars(obj):
+                delattr(obj, name)
+        self.patched = []
+
+    def start(self):
+        """
+        Starting the sampler thread, and tracemalloc when trace_allocations is set
+        :return: self
+        """
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.tracemalloc_frames)
+                self.started_tracemalloc = True
+            self.last_snapshot = self._snapshot()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='security-manager-apis-profiler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stopping the sampler, taking a last allocation snapshot """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.trace_allocations and self.last_snapshot is not None:
+            self._diff_snapshot()
+            self.last_snapshot = None
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own = threading.get_ident()
+        next_snapshot = time.monotonic() + self.snapshot_every
+        while not self.stop_event.wait(self.interval):
+            self._sample(own)
+            if self.trace_allocations and time.monotonic() >= next_snapshot:
+                self._diff_snapshot()
+                next_snapshot = time.monotonic() + self.snapshot_every
+
+    def _sample(self, own: int):
+        frames = sys._current_frames()
+        with self.lock:
+            self.samples += 1
+        for ident, frame in frames.items():
+            labels = self.stacks.get(ident)
+            if ident == own or not labels:
+                continue
+            labels = list(labels)
+            if self.mode == 'cpu' and _blocking(frame.f_code):
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            stack = []
+            depth = 0
+            for code in reversed(codes):
+                if code is _WRAPPER_CODE:
+                    stack.append(labels[depth] if depth < len(labels) else '[api] ?')
+                    depth += 1
+                elif depth and code not in self.wrapped_codes and code.co_name != 'profiled_request':
+                    stack.append(_frame_name(code))
+            if stack:
+                with self.lock:
+                    self.cpu_samples[';'.join(stack)] += 1
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)))
+
+    def _diff_snapshot(self):
+        snapshot = self._snapshot()
+        for diff in snapshot.compare_to(self.last_snapshot, 'traceback'):
+            if diff.size_diff <= 0:
+                continue
+            stack = self._alloc_stack(diff.traceback)
+            if stack:
+                with self.lock:
+                    self.alloc_stacks[';'.join(stack)] += diff.size_diff
+        self.last_snapshot = snapshot
+
+    def _alloc_stack(self, traceback) -> list:
+        stack = []
+        for frame in traceback:
+            label = None
+            for first, last, name in self.code_ranges.get(frame.filename, ()):
+                if first <= frame.lineno <= last:
+                    label = name
+                    break
+            if label is not None:
+                stack.append(label)
+            elif stack and frame.filename != __file__:
+                stack.append('{0}:{1}'.format(os.path.basename(frame.filename), frame.lineno))
+        return stack
+
+    def report(self) -> dict:
+        """
+        :return: dict of label ('[api] Class.method' or '[http] METHOD /endpoint') to calls, seconds (wall time
+                 inside the calls), cpu_seconds (thread CPU time inside the calls), samples and self_samples
+                 (stack samples containing the label / with the label as innermost API or HTTP frame),
+                 sampled_seconds and alloc_bytes (bytes allocated under the label and still alive at the next
+                 snapshot). Nested calls are included in the totals of their callers
+        """
+        samples = collections.Counter()
+        self_samples = collections.Counter()
+        alloc_bytes = collections.Counter()
+        with self.lock:
+            for stack, count in self.cpu_samples.items():
+                labels = [f for f in stack.split(';') if f.startswith('[')]
+                self_samples[labels[-1]] += count
+                for label in set(labels):
+                    samples[label] += count
+            for stack, size in self.alloc_stacks.items():
+                for label in set(f for f in stack.split(';') if f.startswith('[')):
+                    alloc_bytes[label] += size
+            labels = set(self.calls) | set(samples) | set(alloc_bytes)
+            return {label: {'calls': self.calls[label], 'seconds': self.call_seconds[label],
+                            'cpu_seconds': self.call_cpu_seconds[label], 'samples': samples[label],
+                            'self_samples': self_samples[label], 'sampled_seconds': samples[label] * self.interval,
+                            'alloc_bytes': alloc_bytes[label]} for label in labels}
+
+    def collapsed(self, kind: str = 'cpu') -> list:
+        """
+        :param kind: 'cpu' for sample counts, 'alloc' for allocated bytes
+        :return: flamegraph collapsed-stack lines, 'frame;frame;... count'
+        """
+        with self.lock:
+            counter = dict(self.cpu_samples if kind == 'cpu' else self.alloc_stacks)
+        return ['{0} {1}'.format(stack, count) for stack, count in sorted(counter.items())]
+
+    def write_collapsed(self, path: str, kind: str = 'cpu') -> int:
+        """
+        Writing the collapsed stacks, e.g. for flamegraph.pl out.folded > out.svg or speedscope
+        :param path: output file
+        :param kind: 'cpu' or 'alloc'
+        :return: number of stacks written
+        """
+        lines = self.collapsed(kind)
+        with open(path, 'w') as f:
+            for line in lines:
+                f.write(line)
+                f.write('\n')
+        return len(lines)
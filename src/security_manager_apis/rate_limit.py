@@ -0,0 +1,61 @@
+""" Thread-safe token bucket shared by the concurrent engines """
+import threading
+import time
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+class RateLimiter():
+    """ Token bucket allowing `rate` requests per second with bursts of up to `burst` requests """
+
+    def __init__(self, rate: float, burst: int = None):
+        """
+        :param rate: Requests per second, None or 0 disables limiting
+        :param burst: Bucket size, defaults to one second worth of requests
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate or 1))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request may be sent
+        :return: seconds spent waiting
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def host_limiter(host: str, rate: float, burst: int = None) -> RateLimiter:
+    """
+    Returns the limiter shared by every engine talking to host, created on first use. Asking for a different
+    rate or burst than the existing limiter of the host raises, pass a RateLimiter to the engine instead
+    :param host: FireMon server
+    :param rate: Requests per second
+    :param burst: Bucket size, defaults to one second worth of requests
+    :return: RateLimiter
+    """
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = RateLimiter(rate, burst)
+        limiter = _host_limiters[host]
+    requested = RateLimiter(rate, burst)
+    if (limiter.rate or 0) != (requested.rate or 0) or (limiter.rate and limiter.burst != requested.burst):
+        raise Exception("Host '{0}' already has a shared rate limit of {1} requests/s (burst {2}), {3} requests/s "
+                        "(burst {4}) requested".format(host, limiter.rate, limiter.burst, rate, requested.burst))
+    return limiter
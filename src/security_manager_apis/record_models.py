@@ -0,0 +1,249 @@
+""" Compact typed record models for the main Security Manager, Policy Planner and Policy Optimizer payloads """
+import json
+import sys
+
+
+def _intern(value):
+    """
+    Interning strings that repeat across many records (device names, zones, actions, statuses)
+    :param value: value from JSON
+    :return: interned string, or the value unchanged when it is not a string
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _names(items, key='name') -> tuple:
+    """
+    Collapsing a list of JSON objects into a tuple of interned names
+    :param items: list of dicts (or None)
+    :param key: key holding the name
+    :return: tuple of interned strings
+    """
+    if not items:
+        return ()
+    return tuple(_intern(i.get(key)) if isinstance(i, dict) else _intern(i) for i in items)
+
+
+class LazyJson():
+    """ Holds a rarely-used nested JSON value as a compact string and decodes it on first access """
+    __slots__ = ('_raw', '_value')
+
+    def __init__(self, value):
+        self._raw = json.dumps(value, separators=(',', ':'))
+        self._value = None
+
+    def get(self):
+        if self._value is None:
+            self._value = json.loads(self._raw)
+        return self._value
+
+    def release(self):
+        """ Dropping the decoded copy so only the compact string stays in memory """
+        self._value = None
+
+
+class _Record():
+    """ Base class for the typed records, each subclass lists its fields in __slots__ """
+    __slots__ = ('_extra',)
+    _fields = ()
+
+    def extra(self) -> dict:
+        """
+        Returns the fields that were not mapped to attributes, decoded on demand
+        :return: dict of the remaining JSON keys
+        """
+        return self._extra.get() if self._extra is not None else {}
+
+    def to_dict(self) -> dict:
+        """
+        Rebuilding a flat dict from the mapped attributes
+        :return: dict of attribute name to value
+        """
+        return {f: getattr(self, f) for f in self._fields}
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__,
+                                 ', '.join('{0}={1!r}'.format(f, getattr(self, f)) for f in self._fields))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def _set_extra(self, data: dict, used: tuple):
+        rest = {k: v for k, v in data.items() if k not in used}
+        self._extra = LazyJson(rest) if rest else None
+
+
+class Device(_Record):
+    """ Device returned by SecurityManagerApis.get_devices """
+    __slots__ = ('id', 'name', 'management_ip', 'vendor', 'product', 'device_type', 'parent_id', 'domain_id')
+    _fields = __slots__
+    _keys = ('id', 'name', 'managementIp', 'parentId', 'domainId')
+
+    @classmethod
+    def from_json(cls, data: dict):
+        rec = cls()
+        pack = data.get('devicePack') or {}
+        rec.id = data.get('id')
+        rec.name = _intern(data.get('name'))
+        rec.management_ip = data.get('managementIp')
+        rec.vendor = _intern(pack.get('vendor'))
+        rec.product = _intern(pack.get('deviceName'))
+        rec.device_type = _intern(pack.get('type'))
+        rec.parent_id = data.get('parentId')
+        rec.domain_id = data.get('domainId')
+        rec._set_extra(data, cls._keys)
+        return rec
+
+
+class SecurityRule(_Record):
+    """ Security rule returned by SecurityManagerApis.siql_query('secrule', ...) """
+    __slots__ = ('match_id', 'rule_name', 'rule_number', 'action', 'disabled', 'device_id', 'device_name',
+                 'policy_name', 'src_zones', 'dst_zones', 'sources', 'destinations', 'services', 'apps', 'users')
+    _fields = __slots__
+    _keys = ('matchId', 'ruleName', 'ruleNumber', 'action', 'disabled')
+
+    @classmethod
+    def from_json(cls, data: dict):
+        rec = cls()
+        device = data.get('device') or {}
+        policy = data.get('policy') or {}
+        rec.match_id = data.get('matchId')
+        rec.rule_name = data.get('ruleName')
+        rec.rule_number = data.get('ruleNumber')
+        rec.action = _intern(data.get('action'))
+        rec.disabled = data.get('disabled')
+        rec.device_id = device.get('id')
+        rec.device_name = _intern(device.get('name'))
+        rec.policy_name = _intern(policy.get('name'))
+        rec.src_zones = _names((data.get('srcContext') or {}).get('zones'))
+        rec.dst_zones = _names((data.get('dstContext') or {}).get('zones'))
+        rec.sources = _names(data.get('sources'), 'displayName')
+        rec.destinations = _names(data.get('destinations'), 'displayName')
+        rec.services = _names(data.get('services'), 'displayName')
+        rec.apps = _names(data.get('apps'), 'displayName')
+        rec.users = _names(data.get('users'), 'displayName')
+        rec._set_extra(data, cls._keys)
+        return rec
+
+
+class PolicyPlannerTicket(_Record):
+    """ Ticket returned by PolicyPlannerApis.pull_pp_ticket """
+    __slots__ = ('id', 'status', 'summary', 'priority', 'workflow_id', 'created_date', 'due_date',
+                 'assignee', 'requester', '_tasks')
+    _fields = ('id', 'status', 'summary', 'priority', 'workflow_id', 'created_date', 'due_date',
+               'assignee', 'requester')
+    _keys = ('id', 'status', 'createDate', 'variables', 'workflowPacketTasks')
+    _variable_keys = ('summary', 'priority', 'dueDate', 'requesterName')
+
+    @classmethod
+    def from_json(cls, data: dict):
+        rec = cls()
+        variables = data.get('variables') or {}
+        assignee = data.get('currentAssignee') or {}
+        rec.id = data.get('id')
+        rec.status = _intern(data.get('status'))
+        rec.summary = variables.get('summary')
+        rec.priority = _intern(variables.get('priority'))
+        rec.workflow_id = (data.get('workflow') or {}).get('id')
+        rec.created_date = data.get('createDate')
+        rec.due_date = variables.get('dueDate')
+        rec.assignee = _intern(assignee.get('username') if isinstance(assignee, dict) else assignee)
+        rec.requester = _intern(variables.get('requesterName'))
+        tasks = data.get('workflowPacketTasks')
+        rec._tasks = LazyJson(tasks) if tasks else None
+        rest = {k: v for k, v in data.items() if k not in cls._keys}
+        other_variables = {k: v for k, v in variables.items() if k not in cls._variable_keys}
+        if other_variables:
+            rest['variables'] = other_variables
+        rec._extra = LazyJson(rest) if rest else None
+        return rec
+
+    def workflow_packet_tasks(self) -> list:
+        """
+        Decoding workflowPacketTasks on demand
+        :return: list of packet task JSON
+        """
+        return self._tasks.get() if self._tasks is not None else []
+
+    def to_json(self) -> dict:
+        """
+        Returns the subset of ticket JSON understood by get_workflow_task_id and get_workflow_packet_task_id
+        :return: ticket JSON
+        """
+        return {'id': self.id, 'status': self.status, 'workflowPacketTasks': self.workflow_packet_tasks()}
+
+
+class PolicyOptimizerTicket(PolicyPlannerTicket):
+    """ Review ticket returned by PolicyOptimizerApis.get_po_ticket """
+    __slots__ = ('device_id', 'rule_id')
+    _fields = PolicyPlannerTicket._fields + ('device_id', 'rule_id')
+
+    @classmethod
+    def from_json(cls, data: dict):
+        rec = super().from_json(data)
+        variables = data.get('variables') or {}
+        rec.device_id = variables.get('deviceId', data.get('deviceId'))
+        rec.rule_id = variables.get('ruleId', data.get('ruleId'))
+        return rec
+
+
+class SupplementalRoute(_Record):
+    """ Supplemental route as sent by SecurityManagerApis.add_supp_route """
+    __slots__ = ('device_id', 'destination', 'gateway', 'interface_name', 'virtual_router',
+                 'next_virtual_router', 'metric', 'drop')
+    _fields = __slots__
+    _keys = ('deviceId', 'destination', 'gateway', 'interfaceName', 'virtualRouter', 'nextVirtualRouter',
+             'metric', 'drop')
+
+    @classmethod
+    def from_json(cls, data: dict):
+        rec = cls()
+        rec.device_id = data.get('deviceId')
+        rec.destination = data.get('destination')
+        rec.gateway = data.get('gateway')
+        rec.interface_name = _intern(data.get('interfaceName'))
+        rec.virtual_router = _intern(data.get('virtualRouter'))
+        rec.next_virtual_router = _intern(data.get('nextVirtualRouter'))
+        rec.metric = data.get('metric')
+        rec.drop = data.get('drop')
+        rec._set_extra(data, cls._keys)
+        return rec
+
+
+SIQL_MODELS = {
+    'secrule': SecurityRule,
+}
+
+
+def from_results(model, resp: dict) -> list:
+    """
+    Converting the 'results' list of a paged API response into typed records
+    :param model: record class, e.g. Device or SecurityRule
+    :param resp: JSON response of a paged call such as get_devices or siql_query
+    :return: list of records
+    """
+    if not resp:
+        return []
+    return [model.from_json(r) for r in resp.get('results', [])]
+
+
+def devices_from_json(resp: dict) -> list:
+    """
+    :param resp: JSON returned by SecurityManagerApis.get_devices
+    :return: list of Device
+    """
+    return from_results(Device, resp)
+
+
+def siql_from_json(query_type: str, resp: dict) -> list:
+    """
+    :param query_type: query type passed to siql_query, only secrule has a typed model
+    :param resp: JSON returned by SecurityManagerApis.siql_query
+    :return: list of records
+    """
+    if query_type not in SIQL_MODELS:
+        raise Exception("No typed model for SIQL query type '{0}'. Options: {1}".
+                        format(query_type, ', '.join(SIQL_MODELS)))
+    return from_results(SIQL_MODELS[query_type], resp)
@@ -0,0 +1,15 @@
+""" Checking API responses for callers that need to tell an error body from a result """
+
+
+def check_status(resp, what: str):
+    """
+    Raising when the response is not a 2xx
+    :param resp: response of the session
+    :param what: what was requested, used in the exception message
+    :return: resp
+    """
+    if resp is None:
+        raise Exception("{0} could not be retrieved: no response".format(what))
+    if not 200 <= resp.status_code < 300:
+        raise Exception("{0} could not be retrieved: {1} {2}".format(what, resp.status_code, resp.text))
+    return resp
@@ -0,0 +1,212 @@
+""" Declarative supplemental-route sync: only the difference between the desired and current routes is sent """
+import csv
+import hashlib
+import ipaddress
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+ADD = 'add'
+REMOVE = 'remove'
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _network(value):
+    value = _text(value)
+    try:
+        return str(ipaddress.ip_network(value, strict=False))
+    except ValueError:
+        return value.lower() if value else None
+
+
+def _address(value):
+    value = _text(value)
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return value.lower() if value else None
+
+
+def _metric(value):
+    value = _text(value)
+    return int(value) if value is not None else None
+
+
+def _drop(value):
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+def canonical_route(route: dict) -> tuple:
+    """
+    Normalized form of a supplemental route, equal for the CSV row and the route returned by the server
+    :param route: Supplemental Route JSON
+    :return: tuple of device ID, destination, gateway, interface, virtual router, next virtual router,
+             metric and drop
+    """
+    return (_text(route.get('deviceId')), _network(route.get('destination')), _address(route.get('gateway')),
+            _text(route.get('interfaceName')), _text(route.get('virtualRouter')),
+            _text(route.get('nextVirtualRouter')), _metric(route.get('metric')), _drop(route.get('drop')))
+
+
+def route_key(route: dict) -> str:
+    """
+    :param route: Supplemental Route JSON
+    :return: hash of the canonical route
+    """
+    return hashlib.blake2b(json.dumps(canonical_route(route)).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RoutePlan():
+    """ Routes to add and remove per device, computed by RouteReconciler.plan() """
+
+    def __init__(self):
+        self.adds = []
+        self.removes = []
+        self.unchanged = 0
+        self.unremovable = []
+        self.devices = []
+        self.errors = {}
+        self.results = []
+
+    def summary(self) -> dict:
+        """
+        :return: dict of devices, add, remove, unchanged, unremovable (routes to remove that have no ID),
+                 fetch errors and, once applied, failed changes
+        """
+        return {'devices': len(self.devices), ADD: len(self.adds), REMOVE: len(self.removes),
+                'unchanged': self.unchanged, 'unremovable': len(self.unremovable), 'fetch_errors': len(self.errors),
+                'failed': sum(1 for r in self.results if not r['ok'])}
+
+    def lines(self) -> list:
+        """
+        :return: human readable plan, one line per change
+        """
+        lines = []
+        for sign, changes in (('+', self.adds), ('-', [(device_id, route) for device_id, _, route in self.removes]),
+                              ('?', self.unremovable)):
+            for device_id, route in changes:
+                _, destination, gateway, interface, vr, next_vr, metric, drop = canonical_route(route)
+                lines.append('{0} device {1}: {2} via {3} {4} metric {5}{6}{7}'.format(
+                    sign, device_id, destination, gateway, interface or 'vr {0} -> {1}'.format(vr, next_vr),
+                    metric, ' drop' if drop else '', ' (no route ID, not removed)' if sign == '?' else ''))
+        for device_id, error in self.errors.items():
+            lines.append('! device {0}: current routes could not be fetched, skipped ({1})'.format(device_id, error))
+        return lines
+
+    def to_dict(self) -> dict:
+        return {'summary': self.summary(),
+                ADD: [route for _, route in self.adds],
+                REMOVE: [dict(route, id=route_id) for _, route_id, route in self.removes],
+                'unremovable': [dict(route, deviceId=device_id) for device_id, route in self.unremovable],
+                'errors': {device_id: str(error) for device_id, error in self.errors.items()},
+                'results': self.results}
+
+
+class RouteReconciler():
+    """ Fetches the current supplemental routes of each device concurrently, compares them with the desired
+        routes by hashed canonical key and applies only the adds and removes, in parallel """
+
+    def __init__(self, security_manager, max_workers: int = 8, prune: bool = True):
+        """
+        :param security_manager: SecurityManagerApis instance
+        :param max_workers: Number of devices fetched and routes changed in parallel
+        :param prune: Remove current routes that are not desired (and duplicates) on the planned devices
+        """
+        self.security_manager = security_manager
+        self.max_workers = max_workers
+        self.prune = prune
+
+    def read_csv(self, f) -> list:
+        """
+        Reading desired routes from the file format of bulk_add_supp_route, the first line is a header
+        :param f: file stream
+        :return: list of Supplemental Route JSON
+        """
+        routes = []
+        for line_count, row in enumerate(csv.reader(f, delimiter=',')):
+            if line_count == 0 or not row:
+                continue
+            route = self.security_manager.build_route_json(row)
+            self.security_manager.verify_route_json(route)
+            routes.append(route)
+        return routes
+
+    def fetch_current(self, device_ids: list) -> dict:
+        """
+        :param device_ids: Device IDs
+        :return: dict of device ID to list of Supplemental Route JSON, or to the exception raised
+        """
+        def fetch(device_id):
+            try:
+                routes = self.security_manager.get_supp_routes(device_id)
+                if routes is None:
+                    raise Exception("no response")
+                return routes
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(device_ids, pool.map(fetch, device_ids)))
+
+    def plan(self, desired: list, device_ids: list = None) -> RoutePlan:
+        """
+        Computing the changes, nothing is sent
+        :param desired: list of Supplemental Route JSON
+        :param device_ids: Devices to reconcile, the devices of the desired routes by default. A device listed
+                           here without desired routes has all its routes removed when prune is set
+        :return: RoutePlan
+        """
+        wanted = {}
+        for route in desired:
+            wanted.setdefault(str(route['deviceId']), {}).setdefault(route_key(route), route)
+        plan = RoutePlan()
+        plan.devices = [str(d) for d in device_ids] if device_ids is not None else list(wanted)
+        for device_id, current in self.fetch_current(plan.devices).items():
+            if isinstance(current, Exception):
+                plan.errors[device_id] = current
+                continue
+            routes = wanted.get(device_id, {})
+            seen = set()
+            for route in current:
+                key = route_key(dict(route, deviceId=device_id))
+                if key in routes and key not in seen:
+                    seen.add(key)
+                    plan.unchanged += 1
+                elif self.prune and route.get('id') is None:
+                    # a delete needs the route ID, reported instead of sending DELETE .../supplementalroute/None
+                    plan.unremovable.append((device_id, route))
+                elif self.prune:
+                    plan.removes.append((device_id, route.get('id'), route))
+            plan.adds.extend((device_id, route) for key, route in routes.items() if key not in seen)
+        return plan
+
+    def apply(self, plan: RoutePlan) -> RoutePlan:
+        """
+        Sending the adds, then the removes, each in parallel
+        :param plan: RoutePlan from plan()
+        :return: the plan, with one entry per change in plan.results
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            plan.results.extend(pool.map(lambda change: self._send(ADD, *change), plan.adds))
+            plan.results.extend(pool.map(lambda change: self._send(REMOVE, change[0], change[2], change[1]),
+                                         plan.removes))
+        return plan
+
+    def _send(self, action: str, device_id: str, route: dict, route_id=None) -> dict:
+        try:
+            if action == ADD:
+                resp = self.security_manager.add_supp_route(device_id, route)
+            else:
+                resp = self.security_manager.delete_supp_route(device_id, route_id)
+            status, reason = (resp[0], resp[1]) if resp else (None, 'no response')
+        except Exception as e:
+            status, reason = None, str(e)
+        return {'action': action, 'device_id': device_id, 'route_id': route_id, 'key': route_key(route),
+                'status': status, 'reason': reason, 'ok': status is not None and 200 <= status < 300}
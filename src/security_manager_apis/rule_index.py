@@ -0,0 +1,484 @@
+""" Offline index over exported security rules answering rule-match queries in-process """
+import functools
+import ipaddress
+import json
+import mmap
+import struct
+import sys
+from array import array
+from security_manager_apis.siql_export import iter_siql_pages
+
+ANY = 'any'
+_ANY_NAMES = ('any', 'all', '*', 'any4', 'any6')
+_V4_MAPPED = 0xFFFF00000000
+_PROTOCOLS = {'icmp': 1, 'tcp': 6, 'udp': 17, 'gre': 47, 'esp': 50, 'ah': 51, 'icmpv6': 58, 'sctp': 132}
+_MAGIC = b'FMRIDX02'
+_KEY_BYTES = 16
+
+
+def _ip_key(address) -> int:
+    """
+    Mapping IPv4 and IPv6 addresses into one 128-bit key space (IPv4 as ::ffff:a.b.c.d)
+    :param address: ipaddress.IPv4Address or IPv6Address
+    :return: int
+    """
+    if address.version == 4:
+        return _V4_MAPPED | int(address)
+    return int(address)
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_address(text: str):
+    """
+    :param text: '10.0.0.1', '10.0.0.0/24', '10.0.0.1-10.0.0.9', '2001:db8::/32' or 'any'
+    :return: (low key, high key), ANY, or None when the text is not an address (e.g. an FQDN)
+    """
+    text = str(text).strip()
+    if text.lower() in _ANY_NAMES:
+        return ANY
+    try:
+        if '-' in text:
+            low, high = text.split('-', 1)
+            return _ip_key(ipaddress.ip_address(low.strip())), _ip_key(ipaddress.ip_address(high.strip()))
+        network = ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        return None
+    if network.prefixlen == 0:
+        return ANY
+    return _ip_key(network.network_address), _ip_key(network.broadcast_address)
+
+
+def _address_ranges(obj, out: list) -> bool:
+    """
+    Collecting the address ranges of a network object from a rule's sources/destinations
+    :param obj: network object JSON, address entry JSON or string
+    :param out: list receiving (low, high) tuples
+    :return: True when the object covers any address
+    """
+    if isinstance(obj, str):
+        parsed = parse_address(obj)
+    elif not isinstance(obj, dict):
+        return False
+    elif obj.get('startAddress') and obj.get('endAddress'):
+        parsed = parse_address('{0}-{1}'.format(obj['startAddress'], obj['endAddress']))
+    elif obj.get('address'):
+        address = str(obj['address'])
+        if obj.get('cidr') is not None and '/' not in address:
+            address = '{0}/{1}'.format(address, obj['cidr'])
+        parsed = parse_address(address)
+    elif obj.get('addresses') or obj.get('members'):
+        return any([_address_ranges(a, out) for a in (obj.get('addresses') or []) + (obj.get('members') or [])])
+    else:
+        parsed = parse_address(obj.get('displayName') or obj.get('name') or '')
+    if parsed == ANY:
+        return True
+    if parsed is not None:
+        out.append(parsed)
+    return False
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_service(text: str):
+    """
+    :param text: 'tcp/443', 'udp/1000-2000', 'icmp', '6/443' or 'any'
+    :return: (low key, high key) where key = protocol << 16 | port, ANY, or None when not understood
+    """
+    text = str(text).strip().lower()
+    if text in _ANY_NAMES or text in ('ip', 'ip/any'):
+        return ANY
+    protocol, _, ports = text.partition('/')
+    protocol = _PROTOCOLS.get(protocol, protocol)
+    try:
+        protocol = int(protocol)
+        if not ports or ports in _ANY_NAMES:
+            return protocol << 16, protocol << 16 | 0xFFFF
+        low, _, high = ports.partition('-')
+        return protocol << 16 | int(low), protocol << 16 | int(high or low)
+    except ValueError:
+        return None
+
+
+def _service_ranges(obj, out: list) -> bool:
+    """
+    Collecting the protocol/port ranges of a service object from a rule's services
+    :param obj: service object JSON, service entry JSON or string
+    :param out: list receiving (low, high) tuples
+    :return: True when the object covers any service
+    """
+    if isinstance(obj, str):
+        parsed = parse_service(obj)
+    elif not isinstance(obj, dict):
+        return False
+    elif obj.get('services') or obj.get('members'):
+        return any([_service_ranges(s, out) for s in (obj.get('services') or []) + (obj.get('members') or [])])
+    elif obj.get('type') is not None or obj.get('protocol') is not None:
+        protocol = obj.get('protocol') if obj.get('protocol') is not None else obj.get('type')
+        start = obj.get('startPort')
+        end = obj.get('endPort', start)
+        if start is None:
+            parsed = parse_service(str(protocol))
+        else:
+            parsed = parse_service('{0}/{1}-{2}'.format(protocol, start, end))
+    else:
+        parsed = parse_service(obj.get('displayName') or obj.get('name') or '')
+    if parsed == ANY:
+        return True
+    if parsed is not None:
+        out.append(parsed)
+    return False
+
+
+def _names(items) -> list:
+    """
+    :param items: list of zone/app JSON or strings
+    :return: lower-cased names, empty when the list means any
+    """
+    names = []
+    for item in items or []:
+        name = item.get('name') or item.get('displayName') if isinstance(item, dict) else item
+        if name is None:
+            continue
+        name = str(name).lower()
+        if name in _ANY_NAMES:
+            return []
+        names.append(name)
+    return names
+
+
+def parse_rule(rule: dict) -> dict:
+    """
+    Reducing a secrule JSON to the fields used by the index
+    :param rule: secrule JSON from siql_query
+    :return: dict with meta (returned by queries), ranges per dimension and names per hash index
+    """
+    parsed = {
+        'meta': {
+            'match_id': rule.get('matchId'),
+            'rule_name': rule.get('ruleName'),
+            'rule_number': rule.get('ruleNumber'),
+            'action': rule.get('action'),
+            'disabled': bool(rule.get('disabled')),
+            'device_id': (rule.get('device') or {}).get('id'),
+            'device_name': (rule.get('device') or {}).get('name'),
+        },
+    }
+    for dimension, key, collect in (('src', 'sources', _address_ranges), ('dst', 'destinations', _address_ranges),
+                                    ('service', 'services', _service_ranges)):
+        ranges = []
+        objects = rule.get(key) or []
+        is_any = not objects or any([collect(o, ranges) for o in objects])
+        parsed[dimension] = ANY if is_any else ranges
+    parsed['src_zone'] = _names((rule.get('srcContext') or {}).get('zones'))
+    parsed['dst_zone'] = _names((rule.get('dstContext') or {}).get('zones'))
+    parsed['app'] = _names(rule.get('apps'))
+    parsed['action'] = [str(rule.get('action') or '').lower()]
+    return parsed
+
+
+class _PackedKeys():
+    """ Read-only sequence of 128-bit big-endian keys in a buffer, read directly from the mmap """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.count = len(buffer) // _KEY_BYTES
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return int.from_bytes(self.buffer[i * _KEY_BYTES:(i + 1) * _KEY_BYTES], 'big')
+
+
+class IntervalIndex():
+    """ Static interval tree: the intervals are sorted by low key and laid out as an implicit balanced tree,
+        the middle of each slice being the node of that slice, which stores the highest high key below it.
+        Storage is one entry per interval and a lookup visits O(log n) nodes plus the intervals it returns """
+
+    SECTIONS = 5
+
+    def __init__(self, lows, highs, max_highs, ids, any_ids):
+        self.lows = lows
+        self.highs = highs
+        self.max_highs = max_highs
+        self.ids = ids
+        self.any_ids = any_ids
+
+    @classmethod
+    def build(cls, intervals: list, any_ids: list):
+        """
+        :param intervals: list of (low, high, rule number) with inclusive bounds
+        :param any_ids: rule numbers matching every key
+        :return: IntervalIndex
+        """
+        intervals = sorted(set(intervals))
+        lows = [low for low, _, _ in intervals]
+        highs = [high for _, high, _ in intervals]
+        max_highs = list(highs)
+        stack = [(0, len(intervals), False)]
+        while stack:
+            first, last, children_done = stack.pop()
+            if first >= last:
+                continue
+            middle = (first + last) // 2
+            if children_done:
+                for child in ((first + middle) // 2 if first < middle else None,
+                              (middle + 1 + last) // 2 if middle + 1 < last else None):
+                    if child is not None and max_highs[child] > max_highs[middle]:
+                        max_highs[middle] = max_highs[child]
+            else:
+                stack.extend(((first, last, True), (first, middle, False), (middle + 1, last, False)))
+        return cls(lows, highs, max_highs, array('I', [rule for _, _, rule in intervals]),
+                   array('I', sorted(set(any_ids))))
+
+    def lookup(self, key: int) -> set:
+        """
+        :param key: address or service key
+        :return: set of rule numbers covering key
+        """
+        return self.lookup_range(key, key)
+
+    def lookup_range(self, low: int, high: int) -> set:
+        """
+        :param low: first key
+        :param high: last key, inclusive
+        :return: set of rule numbers overlapping [low, high]
+        """
+        found = set(self.any_ids)
+        stack = [(0, len(self.ids))]
+        while stack:
+            first, last = stack.pop()
+            if first >= last:
+                continue
+            middle = (first + last) // 2
+            if self.max_highs[middle] < low:
+                continue
+            stack.append((first, middle))
+            if self.lows[middle] <= high:
+                if self.highs[middle] >= low:
+                    found.add(self.ids[middle])
+                stack.append((middle + 1, last))
+        return found
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sections(self) -> list:
+        return [b''.join(k.to_bytes(_KEY_BYTES, 'big') for k in keys)
+                for keys in (self.lows, self.highs, self.max_highs)] + \
+               [array('I', self.ids).tobytes(), array('I', self.any_ids).tobytes()]
+
+    @classmethod
+    def from_sections(cls, views: list):
+        lows, highs, max_highs, ids, any_ids = views
+        return cls(_PackedKeys(lows), _PackedKeys(highs), _PackedKeys(max_highs), ids.cast('I'),
+                   any_ids.cast('I'))
+
+
+RANGE_DIMENSIONS = ('src', 'dst', 'service')
+HASH_DIMENSIONS = ('src_zone', 'dst_zone', 'app', 'action')
+
+
+class RuleIndex():
+    """ Local index of security rules: interval trees for source/destination addresses and services,
+        hash indexes for zones, apps and actions. Built from a paged secrule export, refreshed per device,
+        and saved to a file that load() maps with mmap """
+
+    def __init__(self):
+        self.device_rules = {}
+        self.meta = []
+        self.ranges = {}
+        self.hashes = {}
+        self.dirty = True
+        self.mapped = None
+
+    def add_rules(self, rules) -> int:
+        """
+        Adding secrule JSON records, replacing nothing. Use refresh_device to replace a device's rules
+        :param rules: iterable of secrule JSON
+        :return: number of rules added
+        """
+        count = 0
+        for rule in rules:
+            parsed = parse_rule(rule)
+            self.device_rules.setdefault(parsed['meta']['device_id'], []).append(parsed)
+            count += 1
+        self.dirty = True
+        return count
+
+    def load_from_siql(self, security_manager, query: str, page_size: int = 1000) -> int:
+        """
+        Building the rule set from a paged secrule export
+        :param security_manager: SecurityManagerApis instance
+        :param query: SIQL query selecting the rules, e.g. 'domain { id = 1 }'
+        :param page_size: Number of rules per page
+        :return: number of rules added. Raises when a page cannot be retrieved, no rule is added then
+        """
+        self._require_writable()
+        rules = []
+        for page in iter_siql_pages(security_manager, 'secrule', query, page_size):
+            rules.extend(page)
+        return self.add_rules(rules)
+
+    def refresh_device(self, security_manager, device_id, query: str = 'device {{ id = {0} }}',
+                       page_size: int = 1000) -> int:
+        """
+        Replacing the rules of one device with a fresh export, once every page was retrieved
+        :param security_manager: SecurityManagerApis instance
+        :param device_id: Device ID
+        :param query: SIQL query template selecting the device's rules
+        :param page_size: Number of rules per page
+        :return: number of rules of the device. Raises when a page cannot be retrieved, the device keeps its
+                 current rules then
+        """
+        self._require_writable()
+        rules = []
+        for page in iter_siql_pages(security_manager, 'secrule', query.format(device_id), page_size):
+            rules.extend(parse_rule(r) for r in page)
+        self.device_rules.pop(device_id, None)
+        self.device_rules.pop(str(device_id), None)
+        if rules:
+            self.device_rules[rules[0]['meta']['device_id']] = rules
+        self.dirty = True
+        return len(rules)
+
+    def _require_writable(self):
+        if self.mapped is not None:
+            raise Exception("Index loaded from file is read-only, rebuild it from an export to refresh it")
+
+    def build(self):
+        """ Rebuilding the indexes, called automatically by queries after rules change """
+        if not self.dirty or self.mapped is not None:
+            return
+        self.meta = []
+        intervals = {dimension: [] for dimension in RANGE_DIMENSIONS}
+        any_ids = {dimension: [] for dimension in RANGE_DIMENSIONS}
+        self.hashes = {dimension: {} for dimension in HASH_DIMENSIONS}
+        for device_id in sorted(self.device_rules, key=str):
+            for parsed in self.device_rules[device_id]:
+                number = len(self.meta)
+                self.meta.append(parsed['meta'])
+                for dimension in RANGE_DIMENSIONS:
+                    if parsed[dimension] == ANY:
+                        any_ids[dimension].append(number)
+                    else:
+                        intervals[dimension].extend((low, high, number) for low, high in parsed[dimension])
+                for dimension in HASH_DIMENSIONS:
+                    for name in parsed[dimension] or [ANY]:
+                        self.hashes[dimension].setdefault(name, []).append(number)
+        self.ranges = {dimension: IntervalIndex.build(intervals[dimension], any_ids[dimension])
+                       for dimension in RANGE_DIMENSIONS}
+        self.dirty = False
+
+    def match(self, src: str = None, dst: str = None, service: str = None, src_zone: str = None,
+              dst_zone: str = None, app: str = None, action: str = None, device_id=None,
+              include_disabled: bool = False) -> list:
+        """
+        Finding the rules matching all given criteria, e.g. match(src='10.1.2.3', service='tcp/443')
+        :param src: source address, network or range
+        :param dst: destination address, network or range
+        :param service: service, e.g. 'tcp/443' or 'udp/53'
+        :param src_zone: source zone name
+        :param dst_zone: destination zone name
+        :param app: application name
+        :param action: rule action, e.g. 'ACCEPT'
+        :param device_id: restrict to one device
+        :param include_disabled: also return disabled rules
+        :return: list of rule dicts (match_id, rule_name, rule_number, action, disabled, device_id, device_name)
+        """
+        self.build()
+        candidates = []
+        for dimension, value, parse in (('src', src, parse_address), ('dst', dst, parse_address),
+                                        ('service', service, parse_service)):
+            if value is None:
+                continue
+            parsed = parse(value)
+            if parsed is None:
+                raise Exception("Could not parse {0} value '{1}'".format(dimension, value))
+            if parsed != ANY:
+                index = self.ranges[dimension]
+                candidates.append(index.lookup(parsed[0]) if parsed[0] == parsed[1]
+                                  else index.lookup_range(parsed[0], parsed[1]))
+        for dimension, value in (('src_zone', src_zone), ('dst_zone', dst_zone), ('app', app),
+                                 ('action', action)):
+            if value is not None:
+                names = self.hashes[dimension]
+                found = set(names.get(str(value).lower(), ()))
+                if dimension != 'action':
+                    found.update(names.get(ANY, ()))
+                candidates.append(found)
+        if candidates:
+            candidates.sort(key=len)
+            numbers = candidates[0].intersection(*candidates[1:])
+        else:
+            numbers = range(len(self.meta))
+        results = []
+        for number in sorted(numbers):
+            meta = self.meta[number]
+            if (include_disabled or not meta['disabled']) and \
+                    (device_id is None or str(meta['device_id']) == str(device_id)):
+                results.append(meta)
+        return results
+
+    def stats(self) -> dict:
+        """
+        :return: number of rules and indexed intervals per dimension
+        """
+        self.build()
+        return {'rules': len(self.meta), 'intervals': {d: len(self.ranges[d]) for d in RANGE_DIMENSIONS}}
+
+    def save(self, path: str):
+        """
+        Writing the index to a file: an 8-byte magic, a 4-byte header length, a JSON header (rule meta,
+        hash indexes, section lengths) and the raw interval index arrays, each aligned on 8 bytes
+        :param path: output file
+        """
+        self.build()
+        sections = []
+        for dimension in RANGE_DIMENSIONS:
+            sections.extend(self.ranges[dimension].sections())
+        header = json.dumps({'byteorder': sys.byteorder, 'meta': self.meta, 'hashes': self.hashes,
+                             'sections': [len(s) for s in sections]}, separators=(',', ':')).encode()
+        with open(path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            f.write(b'\0' * (-f.tell() % 8))
+            for section in sections:
+                f.write(section)
+                f.write(b'\0' * (-len(section) % 8))
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Mapping a saved index. The interval arrays stay in the page cache and are not copied
+        :param path: file written by save()
+        :return: read-only RuleIndex
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        if bytes(view[:8]) != _MAGIC:
+            raise Exception("'{0}' is not a rule index file".format(path))
+        header_length = struct.unpack('<I', view[8:12])[0]
+        header = json.loads(bytes(view[12:12 + header_length]))
+        if header['byteorder'] != sys.byteorder:
+            raise Exception("Rule index was saved on a {0}-endian machine".format(header['byteorder']))
+        position = 12 + header_length
+        position += -position % 8
+        views = []
+        for length in header['sections']:
+            views.append(view[position:position + length])
+            position += length + (-length % 8)
+        index = cls()
+        index.meta = header['meta']
+        index.hashes = header['hashes']
+        size = IntervalIndex.SECTIONS
+        index.ranges = {dimension: IntervalIndex.from_sections(views[i * size:(i + 1) * size])
+                        for i, dimension in enumerate(RANGE_DIMENSIONS)}
+        index.dirty = False
+        index.mapped = mapped
+        return index
@@ -0,0 +1,193 @@
+""" Priority-aware request scheduling beneath the API classes """
+import collections
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# weight: share of the slots when classes compete, max_concurrency: cap on in-flight requests of the class
+DEFAULT_CLASSES = {
+    INTERACTIVE: {'weight': 8, 'max_concurrency': None},
+    BATCH: {'weight': 1, 'max_concurrency': None},
+}
+
+# per thread like a thread local, but a session sending from its own threads can carry it over by running
+# the request in contextvars.copy_context() of the caller
+_priority = contextvars.ContextVar('security_manager_apis_priority', default=None)
+
+
+@contextlib.contextmanager
+def priority(name: str):
+    """
+    Running the requests sent by the current thread in the given priority class, e.g.
+    with scheduler.priority('interactive'): planner.pull_pp_ticket(ticket_id)
+    Threads started by the caller do not inherit it unless they run in a copy of the caller's context
+    :param name: priority class
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority(default: str = None) -> str:
+    """
+    :param default: returned when the current thread has no priority set
+    :return: priority class of the current thread
+    """
+    return _priority.get() or default
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RequestScheduler():
+    """ Weighted fair queuing of requests across priority classes with a global and per-class limit on
+        in-flight requests. Each waiting request is tagged with a virtual finish time advancing by 1/weight
+        per request of its class; the free slot goes to the smallest tag among classes below their cap, so a
+        class with weight 8 gets 8 slots for every slot of a weight 1 class while both are backlogged """
+
+    def __init__(self, max_concurrency: int = 8, classes: dict = None, window: int = 1000):
+        """
+        :param max_concurrency: Maximum requests in flight across all classes, e.g. the server's worker count
+        :param classes: dict of class name to {'weight': int, 'max_concurrency': int or None},
+                        DEFAULT_CLASSES (interactive and batch) when omitted
+        :param window: Number of recent queue waits kept per class for the stats
+        """
+        self.max_concurrency = max_concurrency
+        self.classes = {name: dict(config) for name, config in (classes or DEFAULT_CLASSES).items()}
+        self.lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.virtual_time = 0.0
+        self.running = 0
+        self.queues = {name: collections.deque() for name in self.classes}
+        self.finish_tags = {name: 0.0 for name in self.classes}
+        self.in_flight = {name: 0 for name in self.classes}
+        self.completed = {name: 0 for name in self.classes}
+        self.waits = {name: collections.deque(maxlen=window) for name in self.classes}
+
+    def acquire(self, name: str) -> float:
+        """
+        Blocks until a request of the class may be sent
+        :param name: priority class
+        :return: seconds spent queued
+        """
+        if name not in self.classes:
+            raise Exception("Unknown priority class '{0}', expected one of {1}".format(name, sorted(self.classes)))
+        start = time.monotonic()
+        granted = threading.Event()
+        with self.lock:
+            tag = max(self.virtual_time, self.finish_tags[name]) + 1.0 / self.classes[name]['weight']
+            self.finish_tags[name] = tag
+            self.queues[name].append((tag, next(self.sequence), granted))
+            self._dispatch()
+        granted.wait()
+        waited = time.monotonic() - start
+        with self.lock:
+            self.waits[name].append(waited)
+        return waited
+
+    def release(self, name: str):
+        """
+        Frees the slot taken by acquire(name)
+        :param name: priority class
+        """
+        with self.lock:
+            self.running -= 1
+            self.in_flight[name] -= 1
+            self.completed[name] += 1
+            self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrency:
+            best = None
+            for name, queue in self.queues.items():
+                cap = self.classes[name]['max_concurrency']
+                if queue and (cap is None or self.in_flight[name] < cap):
+                    if best is None or queue[0][:2] < self.queues[best][0][:2]:
+                        best = name
+            if best is None:
+                return
+            tag, _, granted = self.queues[best].popleft()
+            self.virtual_time = max(self.virtual_time, tag)
+            self.running += 1
+            self.in_flight[best] += 1
+            granted.set()
+
+    @contextlib.contextmanager
+    def slot(self, name: str):
+        """
+        Holding a slot of the class for the duration of the block
+        :param name: priority class
+        """
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def session(self, inner, default_priority: str = BATCH):
+        """
+        :param inner: requests.Session or a transport session to schedule
+        :param default_priority: class of requests sent outside a priority() block
+        :return: ScheduledSession
+        """
+        return ScheduledSession(inner, self, default_priority)
+
+    def stats(self) -> dict:
+        """
+        :return: dict of class name to queued, in_flight, completed and queue wait p50, p99 and max in seconds
+        """
+        with self.lock:
+            waits = {name: list(values) for name, values in self.waits.items()}
+            stats = {name: {'queued': len(self.queues[name]), 'in_flight': self.in_flight[name],
+                            'completed': self.completed[name]} for name in self.classes}
+        for name, values in waits.items():
+            stats[name].update(wait_p50=_percentile(values, 0.5), wait_p99=_percentile(values, 0.99),
+                               wait_max=max(values) if values else 0.0)
+        return stats
+
+
+class ScheduledSession():
+    """ Session passed as the session argument of the API classes or FireMonClient, or returned from the
+        session_factory of ClientPool: every request waits for a slot of its priority class, taken from
+        priority() or else the session's default. Sessions of different default priorities can share one
+        scheduler and one inner session """
+
+    def __init__(self, inner, scheduler: RequestScheduler, default_priority: str = BATCH):
+        """
+        :param inner: requests.Session or a transport session sending the requests
+        :param scheduler: RequestScheduler shared by every session talking to the same host
+        :param default_priority: class of requests sent outside a priority() block
+        """
+        self.inner = inner
+        self.scheduler = scheduler
+        self.default_priority = default_priority
+
+    def request(self, method: str, url: str, **kwargs):
+        with self.scheduler.slot(current_priority(self.default_priority)):
+            return self.inner.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
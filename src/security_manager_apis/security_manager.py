@@ -3,10 +3,12 @@ import requests
 import csv
 import authenticate_user
 from security_manager_apis.get_properties_data import get_properties_data
+from security_manager_apis.responses import check_status
 
 class SecurityManagerApis():
 
-    def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str, suppress_ssl_warning=False):
+    def __init__(self, host: str, username: str, password: str, verify_ssl: bool, domain_id: str, suppress_ssl_warning=False,
+                 session=None):
         """ User needs to pass host,username,password,and verify_ssl as parameters while
             creating instance of this class and internally Authentication class instance
             will be created which will set authentication token in the header to get firemon API access
@@ -14,17 +16,40 @@ class SecurityManagerApis():
         if suppress_ssl_warning == True:
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
         self.parser = get_properties_data()
-        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl)
-        self.headers = self.api_instance.get_auth_token()
+        self.session = session if session is not None else requests.Session()
+        self.api_instance = authenticate_user.Authentication(host, username, password, verify_ssl, self.session)
+        self._headers = None
         self.host = host
         self.verify_ssl = verify_ssl
         self.api_resp = ''
         self.domain_id = domain_id
 
-    def get_devices(self) -> dict:
+    @property
+    def headers(self) -> dict:
+        """ Authentication headers, the login request is only made before the first API call """
+        if self._headers is None:
+            self._headers = dict(self.api_instance.get_headers())
+        return self._headers
+
+    @headers.setter
+    def headers(self, value: dict):
+        self._headers = value
+
+    def get_devices(self, page_size: int = None, page: int = None) -> dict:
+        """
+        Retrieve devices in the domain
+        :param page_size: Number of results to return, server default when omitted
+        :param page: Page number to return, starting at 0. Omitted by default
+        :return: JSON of results
+        """
         sm_tkt_url = self.parser.get('REST', 'get_dev_sm_api').format(self.host, self.domain_id)
+        parameters = {}
+        if page_size is not None:
+            parameters['pageSize'] = page_size
+        if page is not None:
+            parameters['page'] = page
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, params=parameters, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while retrieving devices\n Exception : {0}".
@@ -34,40 +59,50 @@ class SecurityManagerApis():
         sm_tkt_url = self.parser.get('REST', 'man_ret_dev_sm_api').format(self.host, self.domain_id, device_id)
         payload = {}
         try:
-            resp = requests.post(url=sm_tkt_url, headers=self.headers, json=payload, verify=self.verify_ssl)
+            resp = self.session.post(url=sm_tkt_url, headers=self.headers, json=payload, verify=self.verify_ssl)
             return resp.status_code
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while while retrieving Device ID '{0}'\n Exception : {1}".
                   format(workflow_id, e.response.text))
 
-    def siql_query(self, query_type: str, query: str, page_size: int) -> dict:
+    def siql_query(self, query_type: str, query: str, page_size: int, page: int = None,
+                   raise_errors: bool = False) -> dict:
         """
         Query objects in Security Manage
         :param query_type: What type of object to query. Options are: secrule, policy, serviceobj, networkobj
         :param query: SIQL query to run
         :param page_size: Number of results to return
+        :param page: Page number to return, starting at 0. Omitted by default
+        :param raise_errors: Raise when the server answers with an error instead of returning its JSON
         :return: JSON of results
         """
         sm_tkt_url = self.parser.get('REST', 'siql_query_sm_api').format(self.host, query_type)
         parameters = {'q': query, 'pageSize': page_size }
+        if page is not None:
+            parameters['page'] = page
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, params=parameters, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, params=parameters, verify=self.verify_ssl)
+            if raise_errors:
+                check_status(resp, "Page {0} of SIQL query '{1}'".format(page, query))
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while while running query\n Exception : {0}".
                   format(e.response.text))
 
-    def zone_search(self, device_id: str, page_size: int) -> dict:
+    def zone_search(self, device_id: str, page_size: int, page: int = None) -> dict:
         """
         Get zones for device
         :param device_id: Device ID
         :param page_size: Number of results to return
+        :param page: Page number to return, starting at 0. Omitted by default
         :return: JSON of results
         """
         sm_tkt_url = self.parser.get('REST', 'zone_search_sm_api').format(self.host, self.domain_id, device_id)
         parameters = {'pageSize': page_size}
+        if page is not None:
+            parameters['page'] = page
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, params=parameters, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, params=parameters, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while while running query\n Exception : {0}".
@@ -83,7 +118,7 @@ class SecurityManagerApis():
         """
         sm_tkt_url = self.parser.get('REST', 'fw_obj_sm_api').format(self.host, obj_type, device_id, match_id)
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while while retrieving firewall object JSON \n Exception : {0}".
@@ -97,7 +132,7 @@ class SecurityManagerApis():
         """
         sm_tkt_url = self.parser.get('REST', 'dev_obj_sm_api').format(self.host, self.domain_id, device_id)
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while while retrieving device object JSON \n Exception : {0}".
@@ -113,12 +148,44 @@ class SecurityManagerApis():
         self.verify_route_json(supplemental_route)
         sm_tkt_url = self.parser.get('REST', 'supp_route_sm_api').format(self.host, device_id)
         try:
-            resp = requests.post(url=sm_tkt_url, headers=self.headers, json=supplemental_route, verify=self.verify_ssl)
+            resp = self.session.post(url=sm_tkt_url, headers=self.headers, json=supplemental_route, verify=self.verify_ssl)
             return resp.status_code, resp.reason, resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while adding supplemental Route to Device ID '{0}'\n Exception : {1}".
                   format(device_id, e.response.text))
 
+    def get_supp_routes(self, device_id: str) -> list:
+        """
+        Function to retrieve the Supplemental Routes of a Device
+        :param device_id: ID of device
+        :return: List of Supplemental Route JSON. Raises when the server does not answer with a list
+        """
+        sm_tkt_url = self.parser.get('REST', 'supp_route_sm_api').format(self.host, device_id)
+        resp = self.session.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+        if not 200 <= resp.status_code < 300:
+            raise Exception("Supplemental Routes of Device ID '{0}' could not be retrieved: {1} {2}".format(
+                device_id, resp.status_code, resp.text))
+        routes = resp.json()
+        if not isinstance(routes, list):
+            raise Exception("Unexpected Supplemental Routes response for Device ID '{0}': {1}".format(
+                device_id, routes))
+        return routes
+
+    def delete_supp_route(self, device_id: str, route_id: str) -> list:
+        """
+        Function to delete a Supplemental Route from a Device
+        :param device_id: ID of device
+        :param route_id: ID of Supplemental Route
+        :return: List containing status code, reason
+        """
+        sm_tkt_url = self.parser.get('REST', 'del_supp_route_sm_api').format(self.host, device_id, route_id)
+        try:
+            resp = self.session.delete(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            return resp.status_code, resp.reason
+        except requests.exceptions.HTTPError as e:
+            print("Exception occurred while deleting supplemental Route '{0}' of Device ID '{1}'\n Exception : {2}".
+                  format(route_id, device_id, e.response.text))
+
     def get_rule_doc(self, device_id: str, rule_id: str) -> dict:
         """
         Function to retrieve rule documentation
@@ -128,7 +195,7 @@ class SecurityManagerApis():
         """
         sm_tkt_url = self.parser.get('REST', 'get_rule_doc').format(self.host, self.domain_id, device_id, rule_id)
         try:
-            resp = requests.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.get(url=sm_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.json()
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while retrieving rule doc for Rule ID '{0}'\n Exception : {1}".
@@ -143,7 +210,7 @@ class SecurityManagerApis():
         """
         pp_tkt_url = self.parser.get('REST', 'update_rule_doc').format(self.host, self.domain_id, device_id)
         try:
-            resp = requests.put(url=pp_tkt_url, headers=self.headers, json=rule_doc, verify=self.verify_ssl)
+            resp = self.session.put(url=pp_tkt_url, headers=self.headers, json=rule_doc, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
             print("Exception occurred while updating rule doc for Device ID '{0}'\n Exception : {1}".
@@ -153,7 +220,7 @@ class SecurityManagerApis():
         self.headers['Connection'] = 'Close'
         pp_tkt_url = self.parser.get('REST', 'logout_api_url').format(self.host)
         try:
-            resp = requests.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
+            resp = self.session.post(url=pp_tkt_url, headers=self.headers, verify=self.verify_ssl)
             return resp.status_code, resp.reason
         except requests.exceptions.HTTPError as e:
             print(
@@ -179,6 +246,23 @@ class SecurityManagerApis():
         print(f'Processed {line_count} lines.')
         return 0
 
+    def reconcile_supp_routes(self, f, dry_run: bool = False, prune: bool = True, max_workers: int = 8):
+        """
+        Making the Supplemental Routes of the devices in the file match it, only the differences are sent.
+        Same file format as bulk_add_supp_route
+        :param f: file stream
+        :param dry_run: Only compute and return the plan
+        :param prune: Delete routes of those devices that are not in the file
+        :param max_workers: Number of devices fetched and routes changed in parallel
+        :return: RoutePlan, with its results filled in when applied
+        """
+        from security_manager_apis.route_reconcile import RouteReconciler
+        reconciler = RouteReconciler(self, max_workers=max_workers, prune=prune)
+        plan = reconciler.plan(reconciler.read_csv(f))
+        if not dry_run:
+            reconciler.apply(plan)
+        return plan
+
     def mk_int(self, s: str) -> int:
         """
         Converting str to int, empty string returns None
@@ -0,0 +1,239 @@
+""" Paged, bounded-memory export of Security Manager SIQL results to NDJSON, Parquet and Arrow IPC """
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from security_manager_apis.paging import iter_pages
+
+# Declared schemas: (column, path, type). A path is a dotted key path, 'key[]' maps over a list and the
+# resulting values are joined with LIST_SEPARATOR so every column stays a flat scalar.
+LIST_SEPARATOR = ','
+
+SCHEMAS = {
+    'secrule': (
+        ('match_id', 'matchId', 'string'),
+        ('rule_name', 'ruleName', 'string'),
+        ('rule_number', 'ruleNumber', 'int'),
+        ('action', 'action', 'string'),
+        ('disabled', 'disabled', 'bool'),
+        ('device_id', 'device.id', 'int'),
+        ('device_name', 'device.name', 'string'),
+        ('policy_name', 'policy.name', 'string'),
+        ('src_zones', 'srcContext.zones[].name', 'string'),
+        ('dst_zones', 'dstContext.zones[].name', 'string'),
+        ('sources', 'sources[].displayName', 'string'),
+        ('destinations', 'destinations[].displayName', 'string'),
+        ('services', 'services[].displayName', 'string'),
+        ('apps', 'apps[].displayName', 'string'),
+        ('users', 'users[].displayName', 'string'),
+    ),
+    'networkobj': (
+        ('match_id', 'matchId', 'string'),
+        ('name', 'name', 'string'),
+        ('display_name', 'displayName', 'string'),
+        ('type', 'type', 'string'),
+        ('device_id', 'device.id', 'int'),
+        ('device_name', 'device.name', 'string'),
+        ('addresses', 'addresses[].address', 'string'),
+        ('members', 'members[].displayName', 'string'),
+        ('description', 'description', 'string'),
+    ),
+    'serviceobj': (
+        ('match_id', 'matchId', 'string'),
+        ('name', 'name', 'string'),
+        ('display_name', 'displayName', 'string'),
+        ('type', 'type', 'string'),
+        ('device_id', 'device.id', 'int'),
+        ('device_name', 'device.name', 'string'),
+        ('protocols', 'services[].type', 'string'),
+        ('start_ports', 'services[].startPort', 'string'),
+        ('end_ports', 'services[].endPort', 'string'),
+        ('members', 'members[].displayName', 'string'),
+        ('description', 'description', 'string'),
+    ),
+}
+
+
+def _extract(value, parts: list):
+    """
+    Following a parsed path through a JSON record
+    :param value: JSON value
+    :param parts: path split on '.'
+    :return: value found, list of values for '[]' paths, or None
+    """
+    for i, part in enumerate(parts):
+        if value is None:
+            return None
+        if part.endswith('[]'):
+            items = value.get(part[:-2]) or []
+            return [v for v in (_extract(item, parts[i + 1:]) for item in items) if v is not None]
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _coerce(value, col_type: str):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        value = LIST_SEPARATOR.join(str(v) for v in value)
+        return value if col_type == 'string' else None
+    if col_type == 'int':
+        return int(value)
+    if col_type == 'bool':
+        return bool(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def flatten_records(records: list, schema: tuple) -> dict:
+    """
+    Flattening a page of records into columns. Top level so it can run in a process pool
+    :param records: list of JSON records from a SIQL page
+    :param schema: tuple of (column, path, type)
+    :return: dict of column name to list of values
+    """
+    columns = {}
+    for name, path, col_type in schema:
+        parts = path.split('.')
+        columns[name] = [_coerce(_extract(r, parts), col_type) for r in records]
+    return columns
+
+
+def iter_siql_pages(security_manager, query_type: str, query: str, page_size: int = 1000):
+    """
+    Paging through a SIQL query
+    :param security_manager: SecurityManagerApis instance
+    :param query_type: What type of object to query. Options are: secrule, policy, serviceobj, networkobj
+    :param query: SIQL query to run
+    :param page_size: Number of results per page
+    :return: generator of result lists, one per page. Raises when a page cannot be retrieved
+    """
+    return iter_pages(lambda page: security_manager.siql_query(query_type, query, page_size, page=page,
+                                                               raise_errors=True), page_size)
+
+
+def _arrow_schema(pa, schema: tuple):
+    types = {'string': pa.string(), 'int': pa.int64(), 'bool': pa.bool_()}
+    return pa.schema([(name, types[col_type]) for name, _, col_type in schema])
+
+
+class SiqlExporter():
+    """ Pages through a SIQL query and writes flattened rows to NDJSON, Parquet and/or Arrow IPC in one pass """
+
+    def __init__(self, security_manager, query_type: str, query: str, schema: tuple = None, page_size: int = 1000,
+                 row_group_size: int = 100000, processes: int = 0):
+        """
+        :param security_manager: SecurityManagerApis instance
+        :param query_type: SIQL query type. Options: secrule, policy, serviceobj, networkobj
+        :param query: SIQL query to run
+        :param schema: tuple of (column, path, type), defaults to SCHEMAS[query_type]
+        :param page_size: Number of results requested per page
+        :param row_group_size: Rows buffered before a Parquet row group / Arrow batch is written
+        :param processes: Size of the process pool used for flattening, 0 flattens in-process
+        """
+        if schema is None:
+            if query_type not in SCHEMAS:
+                raise Exception("No declared schema for SIQL query type '{0}', pass one with schema=".
+                                format(query_type))
+            schema = SCHEMAS[query_type]
+        self.security_manager = security_manager
+        self.query_type = query_type
+        self.query = query
+        self.schema = tuple(tuple(c) for c in schema)
+        self.page_size = page_size
+        self.row_group_size = row_group_size
+        self.processes = processes
+
+    def iter_column_pages(self):
+        """
+        Fetching pages and flattening them, optionally in a process pool. At most processes * 2
+        pages are in flight so memory stays bounded
+        :return: generator of column dicts, one per page, in page order
+        """
+        pages = iter_siql_pages(self.security_manager, self.query_type, self.query, self.page_size)
+        if not self.processes:
+            for records in pages:
+                yield flatten_records(records, self.schema)
+            return
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            pending = []
+            for records in pages:
+                pending.append(pool.submit(flatten_records, records, self.schema))
+                if len(pending) >= self.processes * 2:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def export(self, ndjson_path: str = None, parquet_path: str = None, arrow_path: str = None) -> dict:
+        """
+        Exporting the query results. NDJSON paths ending in .gz are gzip compressed. Files are written as
+        <path>.part and renamed into place once every page was exported; when a page fails they are removed
+        and the exception is raised, so an existing file is never replaced by a truncated export
+        :param ndjson_path: NDJSON output file
+        :param parquet_path: Parquet output file, requires pyarrow
+        :param arrow_path: Arrow IPC output file, requires pyarrow
+        :return: dict with rows, pages and seconds
+        """
+        if not (ndjson_path or parquet_path or arrow_path):
+            raise Exception("At least one of ndjson_path, parquet_path or arrow_path is required")
+        start = time.time()
+        ndjson = None
+        writers = []
+        pa = None
+        if parquet_path or arrow_path:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Parquet/Arrow export requires pyarrow: pip install security-manager-apis[export]")
+            arrow_schema = _arrow_schema(pa, self.schema)
+            if parquet_path:
+                writers.append(pq.ParquetWriter(parquet_path + '.part', arrow_schema))
+            if arrow_path:
+                writers.append(pa.ipc.new_file(arrow_path + '.part', arrow_schema))
+        if ndjson_path:
+            ndjson = gzip.open(ndjson_path + '.part', 'wt') if ndjson_path.endswith('.gz') \
+                else open(ndjson_path + '.part', 'w')
+        paths = [path for path in (ndjson_path, parquet_path, arrow_path) if path]
+        complete = False
+        names = [c[0] for c in self.schema]
+        buffered = {name: [] for name in names}
+        buffered_rows = 0
+        rows = 0
+        pages = 0
+        try:
+            for columns in self.iter_column_pages():
+                count = len(columns[names[0]]) if names else 0
+                pages += 1
+                rows += count
+                if ndjson is not None:
+                    for values in zip(*(columns[name] for name in names)):
+                        ndjson.write(json.dumps(dict(zip(names, values)), separators=(',', ':')))
+                        ndjson.write('\n')
+                if writers:
+                    for name in names:
+                        buffered[name].extend(columns[name])
+                    buffered_rows += count
+                    if buffered_rows >= self.row_group_size:
+                        self._write_batch(pa, arrow_schema, writers, buffered)
+                        buffered = {name: [] for name in names}
+                        buffered_rows = 0
+            if writers and buffered_rows:
+                self._write_batch(pa, arrow_schema, writers, buffered)
+            complete = True
+        finally:
+            if ndjson is not None:
+                ndjson.close()
+            for writer in writers:
+                writer.close()
+            for path in paths:
+                if complete:
+                    os.replace(path + '.part', path)
+                elif os.path.exists(path + '.part'):
+                    os.remove(path + '.part')
+        return {'rows': rows, 'pages': pages, 'seconds': time.time() - start}
+
+    def _write_batch(self, pa, arrow_schema, writers: list, columns: dict):
+        table = pa.Table.from_pydict(columns, schema=arrow_schema)
+        for writer in writers:
+            writer.write_table(table)
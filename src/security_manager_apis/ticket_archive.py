@@ -0,0 +1,162 @@
+""" Resumable export of full Policy Planner tickets to gzip-compressed NDJSON shards """
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from security_manager_apis.paging import iter_pages
+
+CHECKPOINT_FILE = 'checkpoint.json'
+SHARD_NAME = 'tickets-{0:05d}.ndjson.gz'
+
+
+def print_progress(progress: dict):
+    """
+    Default progress reporter
+    :param progress: dict passed by TicketArchive.run
+    """
+    eta = progress['eta_seconds']
+    print('{0}/{1} tickets, {2} failed, {3:.1f} tickets/s, ETA {4}'.format(
+        progress['done'], progress['total'], progress['failed'], progress['tickets_per_second'],
+        '{0:.0f} s'.format(eta) if eta is not None else 'unknown'))
+
+
+class TicketArchive():
+    """ Exports each ticket with its requirements, comments and PCA results as one NDJSON line. Tickets are
+        fetched concurrently and written in shards; a shard is renamed into place and recorded in the
+        checkpoint file only once complete, so an interrupted run resumes with the tickets not yet archived """
+
+    def __init__(self, planner, out_dir: str, max_workers: int = 16, shard_size: int = 1000,
+                 parts: tuple = ('requirements', 'comments', 'pca'), page_size: int = 100):
+        """
+        :param planner: PolicyPlannerApis instance
+        :param out_dir: Directory of the shards and the checkpoint file, created when missing
+        :param max_workers: Number of tickets fetched in parallel
+        :param shard_size: Number of tickets per shard
+        :param parts: Parts fetched besides the ticket: requirements, comments and/or pca
+        :param page_size: Number of search results requested per page by list_ticket_ids
+        """
+        unknown = set(parts) - {'requirements', 'comments', 'pca'}
+        if unknown:
+            raise Exception("Unknown ticket parts: {0}".format(', '.join(sorted(unknown))))
+        self.planner = planner
+        self.out_dir = out_dir
+        self.max_workers = max_workers
+        self.shard_size = shard_size
+        self.parts = parts
+        self.page_size = page_size
+        self.checkpoint_path = os.path.join(out_dir, CHECKPOINT_FILE)
+        self.done = set()
+        self.shards = []
+        self.failed = {}
+        os.makedirs(out_dir, exist_ok=True)
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            self.done = set(checkpoint['done'])
+            self.shards = checkpoint['shards']
+
+    def _save_checkpoint(self):
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'done': sorted(self.done), 'shards': self.shards}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def list_ticket_ids(self, siql_query: str = 'ticket { }') -> list:
+        """
+        :param siql_query: SIQL selecting the tickets to archive
+        :return: list of ticket IDs, as strings
+        """
+        ids = []
+        for page in iter_pages(lambda p: self.planner.siql_query_pp_ticket(siql_query, self.page_size, page=p),
+                               self.page_size):
+            ids.extend(str(ticket['id']) for ticket in page)
+        return ids
+
+    def fetch_ticket(self, ticket_id: str) -> dict:
+        """
+        :param ticket_id: Ticket ID
+        :return: dict of id, ticket and the requested parts. Raises when the ticket or one of its parts cannot be
+                 retrieved, so an incomplete record is never archived
+        """
+        ticket = self.planner.pull_pp_ticket(ticket_id, raise_errors=True)
+        if not ticket or 'workflowPacketTasks' not in ticket:
+            raise Exception("Ticket could not be retrieved: {0}".format(ticket))
+        record = {'id': ticket_id, 'ticket': ticket}
+        if 'requirements' in self.parts:
+            record['requirements'] = self.planner.get_reqs(ticket_id, ticket_json=ticket, raise_errors=True)
+        if 'comments' in self.parts:
+            record['comments'] = self.planner.get_comments(ticket_id, raise_errors=True)
+        if 'pca' in self.parts:
+            record['pca'] = self.planner.retrieve_pca(ticket_id, raise_errors=True)
+        return record
+
+    def _fetch_quietly(self, ticket_id: str):
+        try:
+            return self.fetch_ticket(ticket_id)
+        except Exception as e:
+            return e
+
+    def run(self, ticket_ids: list = None, siql_query: str = 'ticket { }', progress=print_progress,
+            progress_every: float = 10.0) -> dict:
+        """
+        Archiving the tickets not yet in the checkpoint
+        :param ticket_ids: Ticket IDs to archive, all tickets matching siql_query when None
+        :param siql_query: SIQL selecting the tickets when ticket_ids is None
+        :param progress: function called with the progress dict at most every progress_every seconds and at the
+                         end of each shard, None to disable
+        :param progress_every: seconds between progress reports
+        :return: progress dict of done, total, failed, archived (this run), seconds, tickets_per_second and
+                 eta_seconds. Tickets that failed are in self.failed and retried by the next run
+        """
+        if ticket_ids is None:
+            ticket_ids = self.list_ticket_ids(siql_query)
+        ticket_ids = list(dict.fromkeys(str(t) for t in ticket_ids))
+        todo = [t for t in ticket_ids if t not in self.done]
+        counts = {'total': len(ticket_ids), 'before': len(ticket_ids) - len(todo), 'todo': len(todo),
+                  'archived': 0, 'start': time.monotonic()}
+        self.failed = {}
+        reported = counts['start']
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for offset in range(0, len(todo), self.shard_size):
+                batch = todo[offset:offset + self.shard_size]
+                name = SHARD_NAME.format(len(self.shards))
+                path = os.path.join(self.out_dir, name)
+                written = []
+                with gzip.open(path + '.part', 'wt', encoding='utf-8') as f:
+                    for ticket_id, record in zip(batch, pool.map(self._fetch_quietly, batch)):
+                        if isinstance(record, Exception):
+                            self.failed[ticket_id] = record
+                        else:
+                            f.write(json.dumps(record))
+                            f.write('\n')
+                            written.append(ticket_id)
+                        if progress is not None and time.monotonic() - reported >= progress_every:
+                            reported = time.monotonic()
+                            progress(self._progress(counts, len(written)))
+                if written:
+                    os.replace(path + '.part', path)
+                    self.shards.append(name)
+                else:
+                    os.remove(path + '.part')
+                self.done.update(written)
+                counts['archived'] += len(written)
+                self._save_checkpoint()
+                if progress is not None:
+                    reported = time.monotonic()
+                    progress(self._progress(counts))
+        return self._progress(counts)
+
+    def _progress(self, counts: dict, pending: int = 0) -> dict:
+        archived = counts['archived'] + pending
+        seconds = time.monotonic() - counts['start']
+        rate = archived / seconds if seconds > 0 else 0.0
+        remaining = counts['todo'] - archived - len(self.failed)
+        return {'done': counts['before'] + archived, 'total': counts['total'], 'failed': len(self.failed),
+                'archived': archived, 'seconds': seconds, 'tickets_per_second': rate,
+                'eta_seconds': remaining / rate if rate else None}
@@ -0,0 +1,264 @@
+""" Local mirror of Policy Planner and Policy Optimizer tickets kept up to date by SIQL change polling """
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from security_manager_apis.paging import iter_pages
+
+PP = 'pp'
+PO = 'po'
+
+
+def add_clause(siql_query: str, clause: str) -> str:
+    """
+    Adding a condition inside the braces of a SIQL query, e.g. "ticket { status = 'open' }"
+    :param siql_query: SIQL query
+    :param clause: condition to AND with the existing ones
+    :return: SIQL query
+    """
+    end = siql_query.rfind('}')
+    if end == -1:
+        return '{0} AND {1}'.format(siql_query, clause)
+    body = siql_query[siql_query.find('{') + 1:end].strip()
+    if body:
+        clause = '{0} AND {1}'.format(body, clause)
+    return '{0}{{ {1} }}{2}'.format(siql_query[:siql_query.find('{')], clause, siql_query[end + 1:])
+
+
+def clear_clauses(siql_query: str) -> str:
+    """
+    Removing the conditions inside the braces of a SIQL query, e.g. "ticket { status = 'open' }" -> "ticket { }"
+    :param siql_query: SIQL query
+    :return: SIQL query
+    """
+    start = siql_query.find('{')
+    end = siql_query.rfind('}')
+    if start == -1 or end == -1:
+        return siql_query
+    return '{0}{{ }}{1}'.format(siql_query[:start], siql_query[end + 1:])
+
+
+class TicketMirror():
+    """ Keeps Policy Planner and/or Policy Optimizer tickets in memory (and optionally in SQLite).
+        Each sync() only searches for tickets changed since the last watermark and fetches full
+        details for those, concurrently. Tickets that changed and no longer match the query are evicted,
+        tickets whose details could not be fetched (error status or exception) are retried by the next sync.
+        A search that fails on any page raises and leaves the watermark where it was """
+
+    def __init__(self, planner=None, optimizer=None, pp_query: str = 'ticket { }', po_query: str = 'review { }',
+                 db_path: str = None, max_workers: int = 8, page_size: int = 100, updated_field: str = 'lastUpdated',
+                 change_clause: str = "{field} >= '{since}'"):
+        """
+        :param planner: PolicyPlannerApis instance, None to skip Policy Planner tickets
+        :param optimizer: PolicyOptimizerApis instance, None to skip Policy Optimizer tickets
+        :param pp_query: SIQL selecting the Policy Planner tickets to mirror
+        :param po_query: SIQL selecting the Policy Optimizer reviews to mirror
+        :param db_path: SQLite file persisting the mirror and watermarks between runs
+        :param max_workers: Number of ticket details fetched in parallel
+        :param page_size: Number of search results requested per page
+        :param updated_field: Ticket field holding the last modification time
+        :param change_clause: SIQL condition selecting changed tickets, formatted with field and since
+        """
+        self.sources = {}
+        if planner is not None:
+            self.sources[PP] = (pp_query, self._search_pp,
+                                lambda ticket_id: planner.pull_pp_ticket(ticket_id, raise_errors=True), planner)
+        if optimizer is not None:
+            self.sources[PO] = (po_query, self._search_po,
+                                lambda ticket_id: optimizer.get_po_ticket(ticket_id, raise_errors=True), optimizer)
+        if not self.sources:
+            raise Exception("TicketMirror needs a PolicyPlannerApis and/or a PolicyOptimizerApis instance")
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.updated_field = updated_field
+        self.change_clause = change_clause
+        self.lock = threading.RLock()
+        self.tickets = {kind: {} for kind in self.sources}
+        self.versions = {kind: {} for kind in self.sources}
+        self.watermarks = {kind: None for kind in self.sources}
+        self.failed = {kind: {} for kind in self.sources}
+        self.callbacks = []
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS tickets (kind TEXT, id TEXT, updated TEXT, body TEXT, '
+                            'PRIMARY KEY (kind, id))')
+            self.db.execute('CREATE TABLE IF NOT EXISTS watermarks (kind TEXT PRIMARY KEY, since TEXT)')
+            self._load()
+
+    def on_change(self, callback):
+        """
+        Registering a callback called as callback(kind, ticket_id, old_ticket, new_ticket) for every
+        new, modified or evicted ticket, old_ticket is None for new tickets and new_ticket is None for
+        tickets evicted because they no longer match the query
+        :param callback: function
+        """
+        self.callbacks.append(callback)
+
+    def _search_pp(self, query: str, page: int) -> dict:
+        return self.sources[PP][3].siql_query_pp_ticket(query, self.page_size, page=page)
+
+    def _search_po(self, query: str, page: int) -> dict:
+        optimizer = self.sources[PO][3]
+        return optimizer.siql_query_po_ticket({'q': query, 'pageSize': self.page_size, 'page': page,
+                                               'domainId': optimizer.domain_id})
+
+    def sync(self) -> dict:
+        """
+        Polling every source for tickets changed since its watermark and fetching their details
+        :return: dict of kind to number of tickets added or updated
+        """
+        return {kind: self.sync_kind(kind) for kind in self.sources}
+
+    def sync_kind(self, kind: str) -> int:
+        """
+        :param kind: 'pp' or 'po'
+        :return: number of tickets added, updated or evicted. Raises when the change search fails, the
+                 watermark only advances once every page was read
+        """
+        query, search, fetch, _ = self.sources[kind]
+        since = self.watermarks[kind]
+        changed = {}
+        newest = since
+        if since is not None:
+            clause = self.change_clause.format(field=self.updated_field, since=since)
+            queries = [add_clause(query, clause)]
+            if clear_clauses(query) != query:
+                # changes outside the selection tell which mirrored tickets moved out of it
+                queries.append(add_clause(clear_clauses(query), clause))
+        else:
+            queries = [query]
+        for i, siql in enumerate(queries):
+            for page in iter_pages(lambda p: search(siql, p), self.page_size):
+                for summary in page:
+                    ticket_id = str(summary['id'])
+                    updated = summary.get(self.updated_field)
+                    if updated is not None and (newest is None or str(updated) > newest):
+                        newest = str(updated)
+                    if i == 0:
+                        changed[ticket_id] = updated
+                    elif ticket_id not in changed:
+                        changed.setdefault(ticket_id, False)
+        evicted = [ticket_id for ticket_id, updated in changed.items()
+                   if updated is False and ticket_id in self.tickets[kind]]
+        retry = self.failed[kind]
+        to_fetch = {ticket_id: updated for ticket_id, updated in changed.items()
+                    if updated is not False and (updated is None or self.versions[kind].get(ticket_id) != updated)}
+        for ticket_id, updated in retry.items():
+            if changed.get(ticket_id) is not False:
+                to_fetch.setdefault(ticket_id, updated)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            details = list(pool.map(self._fetch_quietly, [fetch] * len(to_fetch), list(to_fetch)))
+        count = 0
+        self.failed[kind] = {}
+        for (ticket_id, updated), ticket in zip(to_fetch.items(), details):
+            if not ticket:
+                self.failed[kind][ticket_id] = updated
+            elif self._store(kind, ticket_id, updated, ticket):
+                count += 1
+        for ticket_id in evicted:
+            if self._evict(kind, ticket_id):
+                count += 1
+        held_back = [str(updated) for updated in self.failed[kind].values() if updated is not None]
+        if held_back:
+            # the next search must return the failed tickets again
+            newest = min(held_back + ([newest] if newest is not None else []))
+        self.watermarks[kind] = newest
+        if self.db is not None:
+            with self.lock:
+                if newest is not None:
+                    self.db.execute('INSERT OR REPLACE INTO watermarks VALUES (?, ?)', (kind, newest))
+                self.db.commit()
+        return count
+
+    @staticmethod
+    def _fetch_quietly(fetch, ticket_id: str):
+        try:
+            return fetch(ticket_id)
+        except Exception as e:
+            print("Exception occurred while fetching ticket '{0}'\n Exception : {1}".format(ticket_id, e))
+
+    def poll(self, interval: float, stop_event: threading.Event):
+        """
+        Calling sync() every interval seconds until stop_event is set
+        :param interval: seconds between polls
+        :param stop_event: threading.Event ending the loop
+        """
+        while not stop_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print("Exception occurred while syncing tickets\n Exception : {0}".format(e))
+            stop_event.wait(interval)
+
+    def _store(self, kind: str, ticket_id: str, updated, ticket: dict) -> bool:
+        with self.lock:
+            old = self.tickets[kind].get(ticket_id)
+            self.versions[kind][ticket_id] = updated
+            if old == ticket:
+                return False
+            self.tickets[kind][ticket_id] = ticket
+            if self.db is not None:
+                self.db.execute('INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?)',
+                                (kind, ticket_id, updated, json.dumps(ticket)))
+        for callback in self.callbacks:
+            callback(kind, ticket_id, old, ticket)
+        return True
+
+    def _evict(self, kind: str, ticket_id: str) -> bool:
+        with self.lock:
+            old = self.tickets[kind].pop(ticket_id, None)
+            self.versions[kind].pop(ticket_id, None)
+            if old is None:
+                return False
+            if self.db is not None:
+                self.db.execute('DELETE FROM tickets WHERE kind = ? AND id = ?', (kind, ticket_id))
+        for callback in self.callbacks:
+            callback(kind, ticket_id, old, None)
+        return True
+
+    def _load(self):
+        for kind, ticket_id, updated, body in self.db.execute('SELECT kind, id, updated, body FROM tickets'):
+            if kind in self.tickets:
+                self.tickets[kind][ticket_id] = json.loads(body)
+                self.versions[kind][ticket_id] = updated
+        for kind, since in self.db.execute('SELECT kind, since FROM watermarks'):
+            if kind in self.watermarks:
+                self.watermarks[kind] = since
+
+    def get(self, kind: str, ticket_id) -> dict:
+        """
+        :param kind: 'pp' or 'po'
+        :param ticket_id: Ticket ID
+        :return: mirrored ticket JSON, or None
+        """
+        return self.tickets[kind].get(str(ticket_id))
+
+    def find(self, kind: str, predicate=None, **fields) -> list:
+        """
+        Local search, e.g. find('pp', status='Review')
+        :param kind: 'pp' or 'po'
+        :param predicate: optional function taking a ticket JSON and returning a bool
+        :param fields: top level ticket fields that must be equal
+        :return: list of ticket JSON
+        """
+        with self.lock:
+            tickets = list(self.tickets[kind].values())
+        return [t for t in tickets
+                if all(t.get(k) == v for k, v in fields.items()) and (predicate is None or predicate(t))]
+
+    def count_by_status(self, kind: str) -> dict:
+        """
+        :param kind: 'pp' or 'po'
+        :return: dict of status to number of tickets
+        """
+        counts = {}
+        with self.lock:
+            for ticket in self.tickets[kind].values():
+                counts[ticket.get('status')] = counts.get(ticket.get('status'), 0) + 1
+        return counts
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,178 @@
+""" Optional transports plugged beneath the API classes through their session argument """
+import gzip
+import json
+import threading
+import requests
+
+# Sent by every transport. requests/urllib3 and httpx decode br only when the brotli package is installed
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+def compress_body(kwargs: dict, min_size: int, level: int) -> int:
+    """
+    Replacing a large json= body with its gzip-compressed form
+    :param kwargs: keyword arguments of a request call, modified in place
+    :param min_size: smallest serialized body worth compressing, in bytes
+    :param level: gzip compression level
+    :return: size of the uncompressed body, 0 when it was not compressed
+    """
+    body = kwargs.get('json')
+    if body is None or kwargs.get('data') is not None or kwargs.get('files') is not None:
+        return 0
+    raw = json.dumps(body).encode('utf-8')
+    if len(raw) < min_size:
+        return 0
+    headers = dict(kwargs.get('headers') or {})
+    headers['Content-Encoding'] = 'gzip'
+    if 'json' not in str(headers.get('Content-Type', '')):
+        headers['Content-Type'] = 'application/json'
+    kwargs.pop('json')
+    kwargs['data'] = gzip.compress(raw, level)
+    kwargs['headers'] = headers
+    return len(raw)
+
+
+class CompressingSession(requests.Session):
+    """ requests.Session that gzip-compresses large JSON request bodies (bulk requirements, rule docs...).
+        If the server answers 415 to a compressed body, the request is re-sent uncompressed and compression
+        is turned off for this session """
+
+    def __init__(self, min_size: int = 1024, level: int = 6, pool_maxsize: int = 10):
+        """
+        :param min_size: smallest serialized JSON body that is compressed, in bytes
+        :param level: gzip compression level
+        :param pool_maxsize: connections kept per host
+        """
+        super().__init__()
+        self.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.min_size = min_size
+        self.level = level
+        self.compress_requests = True
+        self.bytes_saved = 0
+
+    def request(self, method, url, **kwargs):
+        original = dict(kwargs)
+        size = compress_body(kwargs, self.min_size, self.level) if self.compress_requests else 0
+        resp = super().request(method, url, **kwargs)
+        if size:
+            if resp.status_code == 415:
+                self.compress_requests = False
+                return super().request(method, url, **original)
+            self.bytes_saved += size - len(kwargs['data'])
+        return resp
+
+
+class Http2Response():
+    """ Gives an httpx response the attributes the API classes read from a requests response """
+
+    def __init__(self, resp):
+        self.resp = resp
+
+    @property
+    def reason(self) -> str:
+        return self.resp.reason_phrase
+
+    @property
+    def ok(self) -> bool:
+        return self.resp.is_success
+
+    def __getattr__(self, name):
+        return getattr(self.resp, name)
+
+
+class Http2Session():
+    """ requests-compatible session on top of httpx that negotiates HTTP/2 (ALPN over TLS), so concurrent
+        API calls are multiplexed on one connection per host. Needs the http2 extra:
+        pip install security-manager-apis[http2] """
+
+    def __init__(self, verify_ssl: bool = True, compress_requests: bool = False, min_size: int = 1024,
+                 level: int = 6, max_connections: int = 10, timeout: float = 300.0, http1: bool = True):
+        """
+        :param verify_ssl: Verify server certificates, fixed for the session as httpx does not accept it per call
+        :param compress_requests: gzip-compress JSON request bodies of at least min_size bytes
+        :param min_size: smallest serialized JSON body that is compressed, in bytes
+        :param level: gzip compression level
+        :param max_connections: connection limit per session
+        :param timeout: request timeout in seconds
+        :param http1: allow falling back to HTTP/1.1, False forces HTTP/2 (prior knowledge on plain http)
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("HTTP/2 transport requires httpx: pip install security-manager-apis[http2]")
+        self.httpx = httpx
+        self.client = httpx.Client(http2=True, http1=http1, verify=verify_ssl, timeout=timeout,
+                                   headers={'Accept-Encoding': ACCEPT_ENCODING},
+                                   limits=httpx.Limits(max_connections=max_connections))
+        self.compress_requests = compress_requests
+        self.min_size = min_size
+        self.level = level
+        self.lock = threading.Lock()
+        self.bytes_saved = 0
+
+    def request(self, method: str, url: str, headers: dict = None, params: dict = None, json=None, data=None,
+                files=None, verify=None, **kwargs):
+        kwargs.update(headers=headers, json=json, data=data, files=files)
+        original = dict(kwargs)
+        size = compress_body(kwargs, self.min_size, self.level) if self.compress_requests else 0
+        sent = kwargs.get('data')
+        resp = self._send(method, url, params, kwargs)
+        if size:
+            if resp.status_code == 415:
+                self.compress_requests = False
+                return self._send(method, url, params, original)
+            with self.lock:
+                self.bytes_saved += size - len(sent)
+        return resp
+
+    def _send(self, method: str, url: str, params: dict, kwargs: dict) -> Http2Response:
+        body = kwargs.pop('data')
+        if isinstance(body, (str, bytes)):
+            kwargs['content'] = body
+        elif body is not None:
+            kwargs['data'] = body
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        return Http2Response(self.client.request(method, url, params=params, **kwargs))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+def create_session(http2: bool = False, compress_requests: bool = False, verify_ssl: bool = True,
+                   min_size: int = 1024, pool_maxsize: int = 10):
+    """
+    Building a session to pass as the session argument of the API classes or FireMonClient, or to return from
+    the session_factory of ClientPool
+    :param http2: use the httpx HTTP/2 transport
+    :param compress_requests: gzip-compress JSON request bodies of at least min_size bytes
+    :param verify_ssl: Verify server certificates (HTTP/2 transport only, requests takes it per call)
+    :param min_size: smallest serialized JSON body that is compressed, in bytes
+    :param pool_maxsize: connections kept per host
+    :return: Http2Session or requests.Session
+    """
+    if http2:
+        return Http2Session(verify_ssl=verify_ssl, compress_requests=compress_requests, min_size=min_size,
+                            max_connections=pool_maxsize)
+    if compress_requests:
+        return CompressingSession(min_size=min_size, pool_maxsize=pool_maxsize)
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
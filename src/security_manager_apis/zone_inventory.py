@@ -0,0 +1,162 @@
+""" Fleet-wide zone inventory built from concurrent Security Manager zone searches """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from security_manager_apis.paging import fetch_all
+
+
+def _interface_names(zone: dict) -> list:
+    """
+    :param zone: zone object JSON
+    :return: names of the interfaces bound to the zone, when the device reports them
+    """
+    names = []
+    for interface in zone.get('interfaces') or []:
+        name = interface.get('name') if isinstance(interface, dict) else interface
+        if name:
+            names.append(name)
+    return names
+
+
+class ZoneInventory():
+    """ In-memory index of zones across devices: zone name -> devices, device -> zones and
+        device -> interface -> zone. Devices are fetched concurrently and can be refreshed one at a time,
+        all lookups are answered locally """
+
+    def __init__(self, security_manager, max_workers: int = 8, page_size: int = 500):
+        """
+        :param security_manager: SecurityManagerApis instance
+        :param max_workers: Number of devices fetched in parallel
+        :param page_size: Number of zones requested per page
+        """
+        self.security_manager = security_manager
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.device_zones = {}
+        self.zone_devices = {}
+        self.interface_zones = {}
+        self.device_names = {}
+        self.errors = {}
+
+    def list_device_ids(self) -> list:
+        """
+        Pages through all devices of the domain
+        :return: list of device IDs
+        """
+        devices = fetch_all(lambda page: self.security_manager.get_devices(page_size=self.page_size, page=page),
+                            self.page_size)
+        for device in devices:
+            self.device_names[device['id']] = device.get('name')
+        return [device['id'] for device in devices]
+
+    def refresh(self, device_ids: list = None) -> dict:
+        """
+        Fetching zones for the given devices (all devices when None) in parallel and updating the index
+        :param device_ids: Device IDs to refresh
+        :return: dict of device ID to number of zones, devices that failed are listed in self.errors
+        """
+        if device_ids is None:
+            device_ids = self.list_device_ids()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            counts = list(pool.map(self._refresh_quietly, device_ids))
+        return {device_id: count for device_id, count in zip(device_ids, counts) if count is not None}
+
+    def _refresh_quietly(self, device_id):
+        try:
+            return self.refresh_device(device_id)
+        except Exception as e:
+            print("Exception occurred while fetching zones for Device ID '{0}'\n Exception : {1}".
+                  format(device_id, e))
+            self.errors[device_id] = e
+
+    def refresh_device(self, device_id) -> int:
+        """
+        Re-fetching the zones of one device and replacing its entries in the index
+        :param device_id: Device ID
+        :return: Number of zones on the device
+        """
+        zones = fetch_all(lambda page: self.security_manager.zone_search(device_id, self.page_size, page=page),
+                          self.page_size)
+        names = frozenset(z['name'] for z in zones if z.get('name'))
+        interfaces = {}
+        for zone in zones:
+            for interface in _interface_names(zone):
+                interfaces[interface] = zone.get('name')
+        with self.lock:
+            self._remove(device_id)
+            self.device_zones[device_id] = names
+            for name in names:
+                self.zone_devices.setdefault(name, set()).add(device_id)
+            self.interface_zones[device_id] = interfaces
+            self.errors.pop(device_id, None)
+        return len(names)
+
+    def remove_device(self, device_id):
+        """
+        Dropping a device from the index
+        :param device_id: Device ID
+        """
+        with self.lock:
+            self._remove(device_id)
+
+    def _remove(self, device_id):
+        for name in self.device_zones.pop(device_id, ()):
+            devices = self.zone_devices.get(name)
+            if devices is not None:
+                devices.discard(device_id)
+                if not devices:
+                    del self.zone_devices[name]
+        self.interface_zones.pop(device_id, None)
+
+    def zones_for_device(self, device_id) -> frozenset:
+        """
+        :param device_id: Device ID
+        :return: zone names on the device
+        """
+        return self.device_zones.get(device_id, frozenset())
+
+    def devices_with_zone(self, zone_name: str) -> frozenset:
+        """
+        :param zone_name: Zone name
+        :return: IDs of devices that define the zone
+        """
+        return frozenset(self.zone_devices.get(zone_name, ()))
+
+    def zone_for_interface(self, device_id, interface_name: str) -> str:
+        """
+        :param device_id: Device ID
+        :param interface_name: Interface name
+        :return: zone bound to the interface, or None when unknown
+        """
+        return self.interface_zones.get(device_id, {}).get(interface_name)
+
+    def devices_for_zone_pair(self, src_zone: str, dst_zone: str) -> frozenset:
+        """
+        Zone matrix lookup: devices on which traffic can flow from src_zone to dst_zone
+        :param src_zone: Source zone name
+        :param dst_zone: Destination zone name
+        :return: IDs of devices defining both zones
+        """
+        src = self.zone_devices.get(src_zone)
+        dst = self.zone_devices.get(dst_zone)
+        if not src or not dst:
+            return frozenset()
+        return frozenset(src & dst)
+
+    def has_zone_pair(self, device_id, src_zone: str, dst_zone: str) -> bool:
+        """
+        :param device_id: Device ID
+        :param src_zone: Source zone name
+        :param dst_zone: Destination zone name
+        :return: True when the device defines both zones
+        """
+        zones = self.device_zones.get(device_id, ())
+        return src_zone in zones and dst_zone in zones
+
+    def zone_matrix(self, device_id) -> list:
+        """
+        :param device_id: Device ID
+        :return: sorted list of (source zone, destination zone) pairs available on the device
+        """
+        zones = sorted(self.device_zones.get(device_id, ()))
+        return [(src, dst) for src in zones for dst in zones if src != dst]
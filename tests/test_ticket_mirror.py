@@ -0,0 +1,90 @@
+""" Regression tests for TicketMirror failure handling, run with python -m pytest tests """
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytest
+from security_manager_apis.policy_planner import PolicyPlannerApis
+from security_manager_apis.ticket_mirror import TicketMirror
+
+
+class FakeResponse():
+
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class FakePlannerServer():
+    """ Session answering the ticket search and ticket endpoints from an in-memory ticket list """
+
+    def __init__(self, tickets: dict):
+        self.tickets = tickets
+        self.failing_tickets = set()
+        self.failing_page = None
+
+    def get(self, url, headers=None, params=None, verify=None):
+        if url.endswith('/paged-search'):
+            if params['page'] == self.failing_page:
+                return FakeResponse(503, {'status': 503, 'message': 'unavailable'})
+            since = re.search(r"lastUpdated >= '([^']*)'", params['q'])
+            found = sorted((t for t in self.tickets.values() if since is None or t['lastUpdated'] >= since.group(1)),
+                           key=lambda t: t['id'])
+            start = params['page'] * params['pageSize']
+            return FakeResponse(200, {'total': len(found), 'results': found[start:start + params['pageSize']]})
+        ticket_id = int(url.rsplit('/', 1)[1])
+        if ticket_id in self.failing_tickets:
+            return FakeResponse(500, {'status': 500, 'message': 'internal error'})
+        return FakeResponse(200, dict(self.tickets[ticket_id], workflowPacketTasks=[]))
+
+
+def make_mirror(server: FakePlannerServer) -> TicketMirror:
+    planner = PolicyPlannerApis('https://fmos', 'user', 'pass', False, '1', 'Access Req WF', session=server)
+    planner.headers = {}
+    planner.workflow_id = '1'
+    return TicketMirror(planner=planner, page_size=2)
+
+
+def make_tickets(count: int, updated: str = '2024-01-01') -> dict:
+    return {i: {'id': i, 'lastUpdated': updated, 'status': 'open'} for i in range(1, count + 1)}
+
+
+def test_error_status_is_a_failed_fetch_and_retried():
+    server = FakePlannerServer(make_tickets(3))
+    mirror = make_mirror(server)
+    mirror.sync()
+    server.tickets[2]['lastUpdated'] = '2024-01-02'
+    server.tickets[3]['lastUpdated'] = '2024-01-03'
+    server.failing_tickets.add(2)
+    mirror.sync()
+    assert mirror.get('pp', 2)['lastUpdated'] == '2024-01-01'
+    assert '2' in mirror.failed['pp']
+    assert mirror.watermarks['pp'] == '2024-01-02'
+    server.failing_tickets.clear()
+    mirror.sync()
+    assert mirror.get('pp', 2)['lastUpdated'] == '2024-01-02'
+    assert mirror.failed['pp'] == {}
+    assert mirror.watermarks['pp'] == '2024-01-03'
+
+
+def test_failed_search_page_keeps_the_watermark():
+    server = FakePlannerServer(make_tickets(5))
+    mirror = make_mirror(server)
+    mirror.sync()
+    for ticket_id, ticket in server.tickets.items():
+        ticket['lastUpdated'] = '2024-01-0{0}'.format(ticket_id + 1)
+    server.failing_page = 1
+    with pytest.raises(Exception):
+        mirror.sync()
+    assert mirror.watermarks['pp'] == '2024-01-01'
+    server.failing_page = None
+    mirror.sync()
+    assert [mirror.get('pp', i)['lastUpdated'] for i in range(1, 6)] == \
+           ['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-06']
+    assert mirror.watermarks['pp'] == '2024-01-06'